@@ -0,0 +1,95 @@
+"""
+Download archive: which videos were downloaded where, so finished work is
+skipped before any extraction or network traffic.
+"""
+import os
+import time
+
+from cache import SQLiteStore, app_data_dir
+
+
+def normalize_dir(path):
+    return os.path.normcase(os.path.abspath(os.path.expanduser(path)))
+
+
+class OutputIndex:
+    """
+    Snapshot of one output folder joined with the archive: maps
+    (extractor, video id) to the downloaded file, its size and format.
+    A download only counts as complete while its file is still there with
+    the recorded size.
+    """
+    def __init__(self, output_dir, records):
+        self.output_dir = output_dir
+        try:
+            with os.scandir(output_dir) as it:
+                files = {entry.name: entry.stat().st_size for entry in it if entry.is_file()}
+        except OSError:
+            files = {}
+        self.records = {}
+        for extractor, video_id, path, size, format_id in records:
+            if files.get(os.path.basename(path)) == size:
+                self.records[(extractor, video_id)] = {'path': path, 'size': size, 'format_id': format_id}
+
+    def is_complete(self, extractor, video_id):
+        return bool(extractor and video_id) and (extractor.lower(), video_id) in self.records
+
+    def is_complete_entry(self, entry):
+        """
+        Check a (possibly flat) playlist entry or info dict
+        """
+        extractor = entry.get('extractor_key') or entry.get('ie_key')
+        return self.is_complete(extractor, entry.get('id'))
+
+    def get(self, extractor, video_id):
+        return self.records.get((extractor.lower(), video_id))
+
+    def archive_ids(self):
+        """
+        Complete downloads as yt-dlp download_archive ids ('<extractor> <id>')
+        """
+        return {f"{extractor} {video_id}" for extractor, video_id in self.records}
+
+
+class DownloadArchive(SQLiteStore):
+    """
+    Persistent (SQLite) record of finished downloads keyed by extractor,
+    video ID and output folder
+    """
+    def __init__(self, path=None):
+        super().__init__(path or app_data_dir() / 'archive.sqlite3')
+        with self.connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS downloads ("
+                       "extractor TEXT NOT NULL, video_id TEXT NOT NULL, output_dir TEXT NOT NULL, "
+                       "path TEXT NOT NULL, size INTEGER NOT NULL, format_id TEXT, finished REAL NOT NULL, "
+                       "PRIMARY KEY (extractor, video_id, output_dir))")
+
+    def record(self, info, output_dir):
+        """
+        Record a finished download from its (post-processed) yt-dlp info dict
+        """
+        extractor = info.get('extractor_key') or info.get('ie_key')
+        path = info.get('filepath')
+        if not (extractor and info.get('id') and path):
+            return
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self.locked() as db:
+            db.execute("INSERT OR REPLACE INTO downloads "
+                       "(extractor, video_id, output_dir, path, size, format_id, finished) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (extractor.lower(), info['id'], normalize_dir(output_dir), path, size,
+                        info.get('format_id'), time.time()))
+
+    def forget(self, extractor, video_id, output_dir):
+        with self.locked() as db:
+            db.execute("DELETE FROM downloads WHERE extractor = ? AND video_id = ? AND output_dir = ?",
+                       (extractor.lower(), video_id, normalize_dir(output_dir)))
+
+    def index(self, output_dir):
+        with self.locked() as db:
+            records = db.execute("SELECT extractor, video_id, path, size, format_id FROM downloads "
+                                 "WHERE output_dir = ?", (normalize_dir(output_dir),)).fetchall()
+        return OutputIndex(output_dir, records)
@@ -0,0 +1,153 @@
+"""
+Local HTTP server with synthetic media for the offline benchmarks.
+
+    /file/<params>/<name>          progressive file (supports Range requests)
+    /hls/<params>/index.m3u8       HLS media playlist
+    /hls/<params>/seg<i>.ts        HLS fragment
+
+<params> is a comma separated list of key=value pairs:
+    size      bytes of the file / of each fragment
+    segments  number of HLS fragments
+    rate      throttle in bytes/s per connection (0 = unlimited)
+    fail      every fail-th fragment answers 503 on its first request
+
+The payload is a repeated pseudo-random block, so nothing is kept in
+memory per file. Run on its own with: python benchmarks/media_server.py
+"""
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK = random.Random(0).randbytes(64 * 1024)
+WRITE_SIZE = 16 * 1024
+
+
+def parse_params(text):
+    params = {'size': 1024 ** 2, 'segments': 10, 'rate': 0, 'fail': 0}
+    for item in text.split(','):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            params[key] = int(value)
+    return params
+
+
+def payload(start, end):
+    """
+    Bytes start..end (exclusive) of the synthetic payload
+    """
+    out = bytearray()
+    while start < end:
+        offset = start % len(BLOCK)
+        chunk = BLOCK[offset:offset + end - start]
+        out += chunk
+        start += len(chunk)
+    return bytes(out)
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) != 3 or parts[0] not in ('file', 'hls'):
+            self.send_error(404)
+            return
+        kind, params, name = parts[0], parse_params(parts[1]), parts[2]
+        if kind == 'file':
+            self.send_media(params['size'], params['rate'], 'video/mp4')
+        elif name == 'index.m3u8':
+            self.send_playlist(params['segments'])
+        elif name.startswith('seg') and name.endswith('.ts'):
+            index = int(name[3:-3])
+            if params['fail'] and index % params['fail'] == 0 and self.server.fail_once(self.path):
+                self.send_error(503)
+                return
+            self.send_media(params['size'], params['rate'], 'video/mp2t')
+        else:
+            self.send_error(404)
+
+    def send_playlist(self, segments):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4', '#EXT-X-MEDIA-SEQUENCE:0']
+        for i in range(segments):
+            lines += ['#EXTINF:4.000,', f'seg{i}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        body = ('\n'.join(lines) + '\n').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_media(self, size, rate, content_type):
+        start, end = 0, size
+        range_header = self.headers.get('Range')
+        if range_header and range_header.startswith('bytes='):
+            first, _, last = range_header[6:].split(',')[0].partition('-')
+            start = int(first or 0)
+            end = min(int(last) + 1, size) if last else size
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        started = time.monotonic()
+        sent = 0
+        try:
+            while start < end:
+                chunk = payload(start, min(start + WRITE_SIZE, end))
+                self.wfile.write(chunk)
+                start += len(chunk)
+                sent += len(chunk)
+                if rate:
+                    ahead = sent / rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaServer(ThreadingHTTPServer):
+    """
+    The media server, serving from a daemon thread once start()ed
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), MediaHandler)
+        self.failed = set()
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def fail_once(self, path):
+        with self.lock:
+            if path in self.failed:
+                return False
+            self.failed.add(path)
+            return True
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='media server', daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    server = MediaServer(port=8765)
+    print(f"Serving synthetic media on {server.base_url}")
+    server.serve_forever()
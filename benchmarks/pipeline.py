@@ -0,0 +1,310 @@
+"""
+Offline pipeline benchmark: VideoInfoThread -> collect_formats ->
+DownloadThread / DownloadQueue, and the headless cli.py, against a local
+media server and a stub extractor (no network access needed).
+
+    python benchmarks/pipeline.py [--scenarios single,hls,playlist,concurrent,cli]
+                                  [--playlist-size 1000] [--json]
+
+Each scenario runs in a fresh interpreter (with its own cache and data
+folders) and reports extraction latency, time to first byte, throughput,
+retries, peak memory and how often progress reaches the GUI thread
+(queue refreshes, progress updates of a bare DownloadThread, progress
+events on stdout for cli.py). The exit code is 1 if any
+job failed or a scenario crashed or timed out.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+MiB = 1024 ** 2
+
+# name -> how the scenario is run (see run_scenario)
+SCENARIOS = {
+    'single': {'urls': ["bench://video/single?size={}".format(64 * MiB)], 'queue': False},
+    'hls': {'urls': ["bench://video/hls?proto=hls&segments=40&fail=7&rate={}&size={}".format(8 * MiB, 32 * MiB)],
+            'queue': False},
+    'playlist': {'urls': ["bench://playlist/pl?n={n}&size=65536"], 'queue': True, 'workers': 4},
+    'concurrent': {'urls': ["bench://video/c{}?size={}&rate={}".format(i, 16 * MiB, 4 * MiB) for i in range(8)],
+                   'queue': True, 'workers': 8},
+    # A playlist and a video in one batch, through cli.py in a subprocess
+    'cli': {'urls': ["bench://playlist/cli?n=5&size=65536", "bench://video/cli?size={}".format(4 * MiB)],
+            'cli': True},
+}
+
+
+def peak_rss_mib(children=False):
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return rss / MiB if sys.platform == 'darwin' else rss / 1024
+
+
+def wait(done, timeout):
+    """
+    Run the event loop until done() or timeout seconds; False on timeout.
+    done() is polled from a timer, as the GUI does, not by calling
+    processEvents() from Python in a loop (see main.BROKEN_PYSIDE_VERSIONS).
+    """
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    deadline = time.monotonic() + timeout
+    loop = QEventLoop()
+    poll = QTimer()
+    poll.timeout.connect(lambda: (done() or time.monotonic() > deadline) and loop.quit())
+    poll.start(20)
+    loop.exec()
+    poll.stop()
+    return done()
+
+
+def counted(callback, counter):
+    def call(*args):
+        counter[0] += 1
+        return callback(*args)
+    return call
+
+
+def run_cli(spec, work, output, timeout):
+    """
+    Run cli.py on all URLs of the scenario as one batch; returns
+    (failed, progress events, timed out)
+    """
+    command = [sys.executable, os.path.join(ROOT, 'cli.py'), '-o', output,
+               '--metrics-dir', os.path.join(work, 'metrics'), *spec['urls']]
+    # cli.py finds the bench:// extractor plugin through sys.path
+    env = {**os.environ, 'PYTHONPATH': BENCH_DIR + os.pathsep + os.environ.get('PYTHONPATH', '')}
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout, env=env)
+    except subprocess.TimeoutExpired:
+        return len(spec['urls']), 0, True
+    events = [json.loads(line) for line in result.stdout.splitlines() if line.startswith('{')]
+    failed = sum(1 for e in events if e['event'] == 'error')
+    if result.returncode and not failed:
+        # Died before reporting a summary
+        sys.stderr.write(result.stderr)
+        failed = len(spec['urls'])
+    return failed, sum(1 for e in events if e['event'] == 'progress'), False
+
+
+def run_gui(spec, work, output, timeout):
+    """
+    Run the scenario through the GUI classes; returns (failed, GUI updates,
+    timed out, time the infos were fetched)
+    """
+    from PySide6.QtWidgets import QApplication
+    import main
+    from metrics import MetricsSink
+
+    app = QApplication([sys.argv[0]])
+    sink = MetricsSink(os.path.join(work, 'metrics'))
+    timed_out = False
+
+    # Fetch info for all URLs in parallel, like pasting them one after another
+    threads = [main.VideoInfoThread(url, metrics=sink) for url in spec['urls']]
+    infos = {}
+    for thread in threads:
+        thread.info_ready.connect(lambda info, t=thread: infos.__setitem__(t, info))
+        thread.error.connect(lambda message, t=thread: infos.__setitem__(t, None))
+        thread.start()
+    timed_out |= not wait(lambda: len(infos) == len(threads), timeout)
+    fetched = time.monotonic()
+
+    updates = [0]
+    jobs = []
+    if not spec['queue']:
+        # VideoInfoThread -> DownloadThread directly, as the single video path did
+        for thread in threads:
+            info = infos.get(thread)
+            fmt = next(f for f in info['processed_formats'] if f['has_audio'])
+            download = main.DownloadThread(thread.url, fmt['format_id'], output, 'mp4', True, info=info,
+                                           extractor_calls=thread.extractor_calls, metrics=sink)
+            download.downloader.on_progress = counted(download.downloader.on_progress, updates)
+            download.start()
+            jobs.append(download)
+        timed_out |= not wait(lambda: all(download.isFinished() for download in jobs), timeout)
+        for download in jobs:
+            download.wait()
+        failed = sum(1 for download in jobs if not download.success)
+    else:
+        queue = main.DownloadQueue(max_workers=spec['workers'], metrics=sink)
+        queue.refresh_timer.timeout.connect(counted(lambda: None, updates))
+        for thread in threads:
+            info = infos.get(thread)
+            is_playlist = info.get('_type') == 'playlist'
+            preview = next(e for e in info['entries'] if e.get('processed_formats')) if is_playlist else info
+            fmt = next(f for f in preview['processed_formats'] if f['has_audio'])
+            job = main.DownloadJob(thread.url, info.get('title'), fmt['format_id'], output, 'mp4', True,
+                                   is_playlist=is_playlist, info=info, extractor_calls=thread.extractor_calls)
+            jobs.append(job)
+            if is_playlist:
+                queue.add_playlist(job)
+            else:
+                queue.add_job(job)
+        timed_out |= not wait(lambda: all(job.is_finished() for job in jobs), timeout)
+        failed = sum(1 for job in queue.model.jobs if job.state == main.DownloadJob.FAILED and not job.children)
+    return failed, updates[0], timed_out, fetched
+
+
+def run_scenario(name, spec, timeout):
+    """
+    Child process: run one scenario, return the report
+    """
+    sys.path.insert(0, ROOT)
+    work = tempfile.mkdtemp(prefix='bench-')
+    output = os.path.join(work, 'out')
+    os.makedirs(output)
+    started = time.monotonic()
+    if spec.get('cli'):
+        failed, updates, timed_out = run_cli(spec, work, output, timeout)
+        fetched = started
+    else:
+        failed, updates, timed_out, fetched = run_gui(spec, work, output, timeout)
+    ended = time.monotonic()
+
+    records = []
+    try:
+        with open(os.path.join(work, 'metrics', 'metrics.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                records.append(json.loads(line))
+    except FileNotFoundError:  # nothing was recorded
+        pass
+    extraction = [r['seconds'] for r in records if r['event'] == 'extraction']
+    job_records = [r for r in records if r['event'] == 'job']
+    first_byte = [r['first_byte_seconds'] for r in job_records if r['first_byte_seconds'] is not None]
+    per_job = [r['throughput_bytes_per_second'] for r in job_records if r['throughput_bytes_per_second']]
+    downloaded = sum(r['bytes_downloaded'] for r in job_records)
+    return {
+        'scenario': name,
+        'timed_out': timed_out,
+        'jobs': len(job_records),
+        'failed': failed,
+        'wall_seconds': ended - started,
+        'extraction_seconds': {
+            'median': statistics.median(extraction) if extraction else None,
+            'max': max(extraction) if extraction else None,
+        },
+        'first_byte_seconds_median': statistics.median(first_byte) if first_byte else None,
+        'throughput_mib_per_second': {
+            'aggregate': downloaded / MiB / (ended - fetched) if ended > fetched else None,
+            'per_job_median': statistics.median(per_job) / MiB if per_job else None,
+        },
+        'bytes_downloaded': downloaded,
+        'fragment_retries': sum(r['fragment_retries'] for r in job_records),
+        'http_retries': sum(r['http_retries'] for r in job_records),
+        'peak_rss_mib': peak_rss_mib(children=spec.get('cli', False)),
+        'gui_updates': updates,
+        'gui_updates_per_second': updates / (ended - fetched) if ended > fetched else None,
+    }
+
+
+def child_env(server_url, home):
+    env = dict(os.environ)
+    if not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY') and sys.platform.startswith('linux'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env['BENCH_MEDIA_SERVER'] = server_url
+    # Keep caches, the archive and the journal away from the user's own
+    for name in ('XDG_CACHE_HOME', 'XDG_DATA_HOME', 'LOCALAPPDATA', 'APPDATA'):
+        env[name] = home
+    return env
+
+
+def crashed_report(name, spec, wall_seconds, timed_out):
+    """
+    Report for a scenario whose child died before reporting: all of its
+    URLs count as failed
+    """
+    return {
+        'scenario': name,
+        'crashed': True,
+        'timed_out': timed_out,
+        'jobs': 0,
+        'failed': len(spec['urls']),
+        'wall_seconds': wall_seconds,
+        'extraction_seconds': {'median': None, 'max': None},
+        'first_byte_seconds_median': None,
+        'throughput_mib_per_second': {'aggregate': None, 'per_job_median': None},
+        'bytes_downloaded': 0,
+        'fragment_retries': 0,
+        'http_retries': 0,
+        'peak_rss_mib': None,
+        'gui_updates': 0,
+        'gui_updates_per_second': None,
+    }
+
+
+def measure(name, spec, server_url, timeout):
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix='bench-home-') as home:
+        try:
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name,
+                                     '--spec', json.dumps(spec), '--timeout', str(timeout)],
+                                    cwd=ROOT, env=child_env(server_url, home), capture_output=True,
+                                    text=True, timeout=timeout + 60)
+        except subprocess.TimeoutExpired:
+            sys.stderr.write(f"scenario {name} hung past its timeout\n")
+            return crashed_report(name, spec, time.monotonic() - started, True)
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if not lines:
+        sys.stderr.write(f"scenario {name} crashed (exit code {result.returncode}):\n{result.stderr}\n")
+        return crashed_report(name, spec, time.monotonic() - started, False)
+    return json.loads(lines[-1])
+
+
+def format_value(value, unit=""):
+    return "N/A" if value is None else f"{value:.2f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="comma separated scenario names")
+    parser.add_argument('--playlist-size', type=int, default=1000)
+    parser.add_argument('--timeout', type=float, default=600, help="seconds per scenario")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--spec', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, json.loads(args.spec), args.timeout)), flush=True)
+        return 0
+
+    from media_server import MediaServer
+    server = MediaServer().start()
+    reports = []
+    for name in args.scenarios.split(','):
+        spec = dict(SCENARIOS[name])
+        spec['urls'] = [url.format(n=args.playlist_size) for url in spec['urls']]
+        reports.append(measure(name, spec, server.base_url, args.timeout))
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for r in reports:
+            print(f"{r['scenario']}: {r['jobs']} job(s), {r['failed']} failed"
+                  f"{', CRASHED' if r.get('crashed') else ''}"
+                  f"{', TIMED OUT' if r['timed_out'] else ''}, {r['wall_seconds']:.2f}s")
+            print(f"  extraction      median {format_value(r['extraction_seconds']['median'], 's')}, "
+                  f"max {format_value(r['extraction_seconds']['max'], 's')}")
+            print(f"  first byte      median {format_value(r['first_byte_seconds_median'], 's')}")
+            print(f"  throughput      {format_value(r['throughput_mib_per_second']['aggregate'], ' MiB/s')} total, "
+                  f"{format_value(r['throughput_mib_per_second']['per_job_median'], ' MiB/s')} per job (median)")
+            print(f"  retries         {r['fragment_retries']} fragment, {r['http_retries']} http")
+            print(f"  peak memory     {format_value(r['peak_rss_mib'], ' MiB')}")
+            print(f"  GUI updates     {r['gui_updates']} ({format_value(r['gui_updates_per_second'], '/s')})")
+    return 1 if any(r['failed'] or r['timed_out'] for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
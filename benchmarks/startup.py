@@ -0,0 +1,132 @@
+"""
+Startup benchmark: import time of the GUI module and time-to-first-paint of
+the main window, measured in fresh interpreter processes.
+
+    python benchmarks/startup.py [--runs 5] [--json] [--budget-ms 1500]
+
+Without a display, Qt's offscreen platform is used. With --budget-ms the
+exit code is 1 when the median time-to-first-paint exceeds the budget, and
+it is also 1 whenever yt_dlp gets imported before the first paint.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process: show the window and report when it first paints
+PAINT_PROBE = r'''
+import sys, time, json
+import main
+imported = time.time()
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QEvent, QTimer
+app = QApplication(sys.argv)
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            print(json.dumps({'imported': imported, 'painted': time.time(),
+                              'yt_dlp_loaded': 'yt_dlp' in sys.modules}), flush=True)
+            QTimer.singleShot(0, app.quit)
+            app.removeEventFilter(self)
+        return False
+
+probe = FirstPaint()
+app.installEventFilter(probe)
+window = main.YouTubeDownloader()
+window.show()
+app.exec()
+'''
+
+
+def child_env():
+    env = dict(os.environ)
+    if not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY') and sys.platform.startswith('linux'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def measure_imports():
+    """
+    Cumulative import times (ms) of the GUI module and its heaviest dependencies
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=ROOT, env=child_env(), capture_output=True, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)', line)
+        if not match:
+            continue
+        name = match.group(2)
+        if name in ('main', 'core', 'cache', 'progress', 'yt_dlp') or name.startswith('PySide6.'):
+            times.setdefault(name, int(match.group(1)) / 1000)
+    return times
+
+
+def measure_paint():
+    """
+    Seconds from process start to import done and to first paint
+    """
+    started = time.time()
+    result = subprocess.run([sys.executable, '-c', PAINT_PROBE], cwd=ROOT, env=child_env(),
+                            capture_output=True, text=True, timeout=120)
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if not lines:
+        raise RuntimeError(f"window did not paint:\n{result.stderr}")
+    data = json.loads(lines[-1])
+    return {
+        'import_s': data['imported'] - started,
+        'first_paint_s': data['painted'] - started,
+        'yt_dlp_loaded': data['yt_dlp_loaded'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--budget-ms', type=float, help="fail if the median first paint is slower")
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    runs = [measure_paint() for _ in range(args.runs)]
+    report = {
+        'runs': args.runs,
+        'import_ms': imports,
+        'process_to_import_ms': {
+            'median': statistics.median(r['import_s'] for r in runs) * 1000,
+            'min': min(r['import_s'] for r in runs) * 1000,
+        },
+        'time_to_first_paint_ms': {
+            'median': statistics.median(r['first_paint_s'] for r in runs) * 1000,
+            'min': min(r['first_paint_s'] for r in runs) * 1000,
+        },
+        'yt_dlp_loaded_before_paint': any(r['yt_dlp_loaded'] for r in runs),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Runs: {args.runs}")
+        for name, ms in sorted(imports.items(), key=lambda x: -x[1]):
+            print(f"  import {name:<24} {ms:8.1f} ms")
+        print(f"Process start -> imports done: median {report['process_to_import_ms']['median']:.0f} ms, "
+              f"min {report['process_to_import_ms']['min']:.0f} ms")
+        print(f"Process start -> first paint:  median {report['time_to_first_paint_ms']['median']:.0f} ms, "
+              f"min {report['time_to_first_paint_ms']['min']:.0f} ms")
+        print(f"yt_dlp imported before first paint: {report['yt_dlp_loaded_before_paint']}")
+
+    failed = report['yt_dlp_loaded_before_paint']
+    if args.budget_ms is not None and report['time_to_first_paint_ms']['median'] > args.budget_ms:
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Stub extractor for the offline benchmarks (a yt-dlp plugin, picked up when
+the benchmarks folder is on sys.path). Media URLs point at the local media
+server named by the BENCH_MEDIA_SERVER environment variable.
+
+    bench://video/<id>?size=<bytes>&rate=<bytes/s>&proto=http|hls&segments=<n>&fail=<k>&delay=<s>
+    bench://playlist/<id>?n=<entries>&<video options>
+"""
+import os
+import time
+from urllib.parse import parse_qs, urlencode
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class BenchIE(InfoExtractor):
+    IE_NAME = 'bench'
+    _VALID_URL = r'bench://(?P<kind>video|playlist)/(?P<id>[\w-]+)(?:\?(?P<query>.*))?$'
+
+    def _real_extract(self, url):
+        kind, video_id, query = self._match_valid_url(url).group('kind', 'id', 'query')
+        options = {k: v[0] for k, v in parse_qs(query or '').items()}
+        # Simulated extraction latency
+        time.sleep(float(options.pop('delay', 0)))
+        if kind == 'playlist':
+            count = int(options.pop('n', 10))
+            suffix = f"?{urlencode(options)}" if options else ""
+            entries = [self.url_result(f"bench://video/{video_id}-{i}{suffix}", self.ie_key(),
+                                       f"{video_id}-{i}", f"Bench entry {i}")
+                       for i in range(1, count + 1)]
+            return self.playlist_result(entries, video_id, f"Bench playlist {video_id}")
+        return {
+            'id': video_id,
+            'title': f"Bench video {video_id}",
+            'duration': 60,
+            'uploader': 'bench',
+            'formats': self.bench_formats(video_id, options),
+        }
+
+    def bench_formats(self, video_id, options):
+        base = os.environ['BENCH_MEDIA_SERVER']
+        size = int(options.get('size', 1024 ** 2))
+        rate = int(options.get('rate', 0))
+        formats = [
+            # Video-only and audio-only streams (listed, only used when merging)
+            {'format_id': 'video-1080', 'url': f"{base}/file/size={size * 3},rate={rate}/{video_id}-v.mp4",
+             'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none', 'height': 1080, 'width': 1920,
+             'filesize': size * 3},
+            {'format_id': 'audio-128', 'url': f"{base}/file/size={size // 8},rate={rate}/{video_id}-a.m4a",
+             'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 128, 'filesize': size // 8},
+        ]
+        if options.get('proto') == 'hls':
+            segments = int(options.get('segments', 10))
+            params = f"size={max(size // segments, 1)},segments={segments},rate={rate},fail={options.get('fail', 0)}"
+            formats.append({
+                'format_id': 'hls-720', 'url': f"{base}/hls/{params}/index.m3u8", 'protocol': 'm3u8_native',
+                'ext': 'mp4', 'vcodec': 'avc1.64001f', 'acodec': 'mp4a.40.2', 'height': 720, 'width': 1280,
+                'filesize_approx': size,
+            })
+        else:
+            formats.append({
+                'format_id': 'progressive-480', 'url': f"{base}/file/size={size},rate={rate}/{video_id}.mp4",
+                'ext': 'mp4', 'vcodec': 'avc1.4d401e', 'acodec': 'mp4a.40.2', 'height': 480, 'width': 854,
+                'filesize': size,
+            })
+        return formats
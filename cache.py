@@ -0,0 +1,240 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from urls import canonicalize
+
+
+def app_cache_dir():
+    """
+    Per-user cache directory of the application (created on demand)
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or str(Path.home() / 'AppData' / 'Local')
+    elif sys.platform == 'darwin':
+        base = str(Path.home() / 'Library' / 'Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    path = Path(base) / 'YouTubeDownloader'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def app_data_dir():
+    """
+    Per-user data directory of the application (created on demand),
+    for state that must survive clearing the cache
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or str(Path.home() / 'AppData' / 'Roaming')
+    elif sys.platform == 'darwin':
+        base = str(Path.home() / 'Library' / 'Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or str(Path.home() / '.local' / 'share')
+    path = Path(base) / 'YouTubeDownloader'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class SQLiteStore:
+    """
+    Base of the SQLite-backed stores: a connection per call, committed (or
+    rolled back) when the block ends. locked() serializes the calls of this
+    process; other processes wait up to 10s for the database lock.
+    """
+    pragmas = ()  # run on every connection
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            for pragma in self.pragmas:
+                db.execute(f"PRAGMA {pragma}")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def locked(self):
+        with self.lock, self.connect() as db:
+            yield db
+
+
+def cache_key(url):
+    """
+    Cache key for a YouTube URL ('playlist:<id>' or 'video:<id>', see
+    urls.canonicalize), or None if the URL shape is not recognised
+    """
+    key = canonicalize(url)
+    return f"{key[0]}:{key[1]}" if key else None
+
+
+# Fields kept in the cache. Formats (and with them the signed media URLs,
+# which expire after a few hours) are never stored.
+INFO_FIELDS = ('_type', 'id', 'title', 'duration', 'uploader', 'channel', 'webpage_url',
+               'extractor', 'extractor_key', 'thumbnail', 'playlist_count', 'processed_formats',
+               'processed_audio')
+ENTRY_FIELDS = ('_type', 'id', 'url', 'ie_key', 'title', 'duration', 'uploader')
+
+
+def slim_info(info):
+    """
+    Cacheable copy of an info dict produced by VideoInfoThread
+    """
+    out = {k: info[k] for k in INFO_FIELDS if info.get(k) is not None}
+    if info.get('_type') == 'playlist':
+        entries = []
+        for entry in info.get('entries') or []:
+            if not isinstance(entry, dict):
+                entries.append(None)
+            elif entry.get('formats'):
+                entries.append(slim_info(entry))
+            else:
+                entries.append({k: entry[k] for k in ENTRY_FIELDS if entry.get(k) is not None})
+        out['entries'] = entries
+        if info.get('requested_entries'):
+            out['requested_entries'] = list(info['requested_entries'])
+    return out
+
+
+class MetadataCache(SQLiteStore):
+    """
+    On-disk (SQLite) cache of processed video/playlist info with a TTL,
+    a size cap with LRU eviction and hit/miss statistics
+    """
+    def __init__(self, path=None, ttl=24 * 3600, max_bytes=64 * 1024 ** 2):
+        super().__init__(path or app_cache_dir() / 'metadata.sqlite3')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        with self.connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS info ("
+                       "key TEXT PRIMARY KEY, data TEXT NOT NULL, size INTEGER NOT NULL, "
+                       "created REAL NOT NULL, accessed REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS info_accessed ON info (accessed)")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _count(self, db, name):
+        db.execute("INSERT INTO stats (name, value) VALUES (?, 1) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def get(self, key):
+        now = time.time()
+        with self.locked() as db:
+            row = db.execute("SELECT data, created FROM info WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] + self.ttl < now:
+                if row is not None:
+                    db.execute("DELETE FROM info WHERE key = ?", (key,))
+                self._count(db, 'misses')
+                return None
+            db.execute("UPDATE info SET accessed = ? WHERE key = ?", (now, key))
+            self._count(db, 'hits')
+            return json.loads(row[0])
+
+    def put(self, key, info):
+        data = json.dumps(info, ensure_ascii=False)
+        now = time.time()
+        with self.locked() as db:
+            db.execute("INSERT OR REPLACE INTO info (key, data, size, created, accessed) "
+                       "VALUES (?, ?, ?, ?, ?)", (key, data, len(data), now, now))
+            self._evict(db)
+
+    def _evict(self, db):
+        db.execute("DELETE FROM info WHERE created < ?", (time.time() - self.ttl,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM info").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM info ORDER BY accessed").fetchall():
+            db.execute("DELETE FROM info WHERE key = ?", (key,))
+            self._count(db, 'evictions')
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, key):
+        with self.locked() as db:
+            db.execute("DELETE FROM info WHERE key = ?", (key,))
+
+    def stats(self):
+        with self.locked() as db:
+            stats = dict(db.execute("SELECT name, value FROM stats").fetchall())
+            count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info").fetchone()
+        return {
+            'hits': stats.get('hits', 0),
+            'misses': stats.get('misses', 0),
+            'evictions': stats.get('evictions', 0),
+            'entries': count,
+            'bytes': size,
+        }
+
+
+class ThumbnailStore:
+    """
+    On-disk store of (pre-scaled) thumbnail images keyed by video ID and
+    variant name, pruned least recently used first beyond max_bytes
+    """
+    PRUNE_EVERY = 50  # puts between size checks
+
+    def __init__(self, path=None, max_bytes=256 * 1024 ** 2):
+        self.path = Path(path or app_cache_dir() / 'thumbnails')
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.puts = 0
+
+    def file(self, video_id, variant):
+        if not re.fullmatch(r'[\w-]+', video_id or ''):
+            return None
+        return self.path / f"{video_id}_{variant}.jpg"
+
+    def get(self, video_id, variant):
+        path = self.file(video_id, variant)
+        if path is None:
+            return None
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # mtime doubles as last access for pruning
+            return data
+        except OSError:
+            return None
+
+    def put(self, video_id, variant, data):
+        path = self.file(video_id, variant)
+        if path is None:
+            return
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        with self.lock:
+            self.puts += 1
+            if self.puts % self.PRUNE_EVERY == 0:
+                self.prune()
+
+    def prune(self):
+        files = []
+        for path in self.path.glob('*.jpg'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,209 @@
+"""
+Headless batch downloader: same options as the GUI format dialog, progress
+as JSON lines on stdout. Never imports Qt, so it runs without a display.
+
+    python cli.py URL [URL ...] [-a urls.txt] [-o DIR] [-q 1080p] [-f mkv]
+    python cli.py URL -x [-f opus]
+    python cli.py PLAYLIST_OR_CHANNEL_URL --sync    (only what was added since the last sync)
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+
+from archive import DownloadArchive
+from cache import MetadataCache, cache_key
+from metrics import MetricsSink
+from storage import clean_staging, staging_dir
+from sync import SyncState
+from core import (DEFAULT_PERFORMANCE_SETTINGS, EXTERNAL_DOWNLOADER_ARGS, Downloader,
+                  download_error_message, fetch_info, fetch_new_entries, plan_audio, plan_merge,
+                  select_format)
+
+VIDEO_FORMATS = ['mp4', 'mkv', 'webm']
+AUDIO_FORMATS = ['m4a', 'opus', 'mp3']
+
+
+def emit(event, **fields):
+    print(json.dumps({'event': event, 'time': round(time.time(), 3), **fields}, ensure_ascii=False),
+          flush=True)
+
+
+def read_urls(args):
+    urls = list(args.urls)
+    if args.batch_file:
+        with open(args.batch_file, encoding='utf-8') if args.batch_file != '-' else sys.stdin as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    urls.append(line)
+    return urls
+
+
+def download(url, args, cache, performance, archive=None, metrics=None, sync=None):
+    """
+    Fetch info, pick the format and download url; returns the Downloader,
+    or None if everything was already downloaded to the output folder.
+    With a sync state (sync.SyncState) only the entries of a playlist or
+    channel added since its last sync are fetched and downloaded.
+    """
+    index = archive.index(args.output) if archive is not None else None
+    key = cache_key(url)
+    if index is not None and key and key.startswith('video:') and index.is_complete('Youtube', key[6:]):
+        emit('skipped', url=url, reason='archive', path=index.get('Youtube', key[6:])['path'])
+        return None
+
+    emit('info', url=url, status='fetching')
+    started = time.monotonic()
+    skip_entry = index.is_complete_entry if index is not None else None
+    if sync is not None and not (key and key.startswith('video:')):
+        info, extractor_calls = fetch_new_entries(url, sync, skip_entry)
+        if not info['entries']:
+            emit('skipped', url=url, reason='up-to-date', extractor_calls=extractor_calls)
+            return None
+    else:
+        info, extractor_calls = fetch_info(url, cache, skip_entry)
+    if metrics is not None:
+        metrics.record_extraction(url, time.monotonic() - started, extractor_calls, cached=extractor_calls == 0)
+    is_playlist = info.get('_type') == 'playlist'
+    preview = info
+    if is_playlist:
+        entries = [e for e in info.get('entries') or [] if isinstance(e, dict)]
+        if not entries:
+            raise ValueError("No valid videos found in this playlist.")
+        preview = next((e for e in entries if e.get('processed_formats') is not None), None)
+        if preview is None and index is not None and all(index.is_complete_entry(e) for e in entries):
+            emit('skipped', url=url, reason='archive', entries=len(entries))
+            return None
+        preview = preview or entries[0]
+
+    if args.audio_only:
+        if not preview.get('processed_audio'):
+            raise ValueError("No audio formats available")
+        plan = plan_audio(preview['processed_audio'], args.format)
+        fmt = plan['audio']
+        emit('info', url=url, status='ready', title=info.get('title'), playlist=is_playlist,
+             format_id=fmt['format_id'], has_audio=True, acodec=fmt['acodec'], abr=fmt['abr'],
+             estimated_bytes=plan['size'], extractor_calls=extractor_calls)
+    else:
+        quality = select_format(preview.get('processed_formats', []), args.quality)
+        if quality is None:
+            raise ValueError("No formats available")
+        plan = plan_merge(quality, preview.get('processed_audio'), args.format)
+        fmt = plan['video']
+        emit('info', url=url, status='ready', title=info.get('title'), playlist=is_playlist,
+             quality=quality['quality'], format_id=fmt['format_id'], has_audio=fmt['has_audio'],
+             vcodec=fmt.get('vcodec'), audio_format_id=plan['audio'] and plan['audio']['format_id'],
+             estimated_bytes=plan['size'], extractor_calls=extractor_calls)
+    if plan['transcode']:
+        emit('warning', url=url, message=f"re-encoding to {args.format}: " + "; ".join(plan['transcode']))
+
+    def on_progress(percent, message):
+        emit('progress', url=url, **{**(downloader.last_progress or {}), 'percent': percent, 'message': message})
+
+    def on_stage(stage):
+        emit('stage', url=url, stage=stage)
+
+    downloader = Downloader(url, fmt['format_id'], args.output, args.format, fmt.get('has_audio', True),
+                            is_playlist=is_playlist, info=info, extractor_calls=extractor_calls,
+                            performance=performance, on_progress=on_progress, on_stage=on_stage,
+                            archive=archive, merge_plan=plan)
+    # The Downloader may turn entries into stubs, keep what is new for the sync state
+    synced = dict(info, entries=list(info['entries'])) if 'sync_key' in info else None
+    try:
+        downloader.run()
+    finally:
+        if metrics is not None:
+            metrics.record_job(downloader.metrics)
+    if synced is not None:
+        # Only after success, so a failed sync picks its entries up again
+        sync.mark_seen(synced)
+    return downloader
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download YouTube videos and playlists without the GUI.")
+    parser.add_argument('urls', nargs='*', metavar='URL', help="video or playlist URL")
+    parser.add_argument('-a', '--batch-file', help="file with one URL per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', default=str(Path.home() / "Downloads"), help="save folder")
+    parser.add_argument('-q', '--quality', default='best',
+                        help="'best', 'worst', a quality like '1080p' / '720p 60fps', or a height limit like '720'")
+    parser.add_argument('-f', '--format', choices=VIDEO_FORMATS + AUDIO_FORMATS,
+                        help="output container (default: mp4, or m4a with --audio-only)")
+    parser.add_argument('-x', '--audio-only', action='store_true',
+                        help="download only the audio stream (-q is ignored)")
+    parser.add_argument('--fragments', type=int, default=DEFAULT_PERFORMANCE_SETTINGS['concurrent_fragments'],
+                        help="DASH/HLS fragments downloaded in parallel")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_PERFORMANCE_SETTINGS['http_chunk_size'],
+                        help="HTTP chunk size in bytes (0 = single request)")
+    parser.add_argument('--downloader', default='', choices=[''] + list(EXTERNAL_DOWNLOADER_ARGS),
+                        help="external downloader for DASH/HLS")
+    parser.add_argument('--staging-dir', default=DEFAULT_PERFORMANCE_SETTINGS['staging_dir'],
+                        help="folder for temporary files, on the same filesystem as the save folder "
+                             "(default: .staging in the save folder)")
+    parser.add_argument('--sync', action='store_true',
+                        help="for playlists and channels, download only the videos added since the last "
+                             "sync (channel tabs stop paging at the first videos seen before)")
+    parser.add_argument('--no-cache', action='store_true', help="do not use the metadata cache")
+    parser.add_argument('--no-archive', action='store_true',
+                        help="download again even if already downloaded to the output folder")
+    parser.add_argument('--metrics-dir', help="where to write metrics.jsonl and metrics.prom "
+                                              "(default: the application data folder)")
+    parser.add_argument('--no-metrics', action='store_true', help="do not record performance metrics")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log to stderr")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format='%(asctime)s %(levelname)s %(message)s')
+    if args.format is None:
+        args.format = AUDIO_FORMATS[0] if args.audio_only else VIDEO_FORMATS[0]
+    elif (args.format in AUDIO_FORMATS) != args.audio_only:
+        parser.error(f"-f {args.format} " + ("requires --audio-only" if args.format in AUDIO_FORMATS
+                                             else "cannot be used with --audio-only"))
+    urls = read_urls(args)
+    if not urls:
+        parser.error("no URL given")
+
+    cache = None if args.no_cache else MetadataCache()
+    archive = None if args.no_archive else DownloadArchive()
+    metrics = None if args.no_metrics else MetricsSink(args.metrics_dir)
+    sync = SyncState() if args.sync else None
+    performance = {
+        'concurrent_fragments': args.fragments,
+        'http_chunk_size': args.chunk_size,
+        'external_downloader': args.downloader,
+        'staging_dir': args.staging_dir,
+    }
+    # Leftovers of failed runs too old to be resumed
+    clean_staging(staging_dir(args.output, args.staging_dir))
+    failed = skipped = 0
+    seen = set()
+    for url in urls:
+        # One download per video/playlist, whatever URL shapes were given
+        key = cache_key(url) or url
+        if key in seen:
+            skipped += 1
+            emit('skipped', url=url, reason='duplicate', key=key)
+            continue
+        seen.add(key)
+        try:
+            downloader = download(url, args, cache, performance, archive, metrics, sync)
+            if downloader is None:
+                skipped += 1
+                continue
+            record = downloader.metrics.record()
+            emit('done', url=url, extractor_calls=downloader.extractor_calls,
+                 postprocess_seconds=round(downloader.postprocess_seconds, 3),
+                 first_byte_seconds=record['first_byte_seconds'], download_seconds=record['download_seconds'],
+                 bytes_written=record['bytes_written'], fragment_retries=record['fragment_retries'])
+        except Exception as e:
+            failed += 1
+            emit('error', url=url, message=download_error_message(e))
+    emit('summary', total=len(urls), failed=failed, skipped=skipped)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
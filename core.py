@@ -0,0 +1,953 @@
+"""
+Download logic shared by the GUI (main.py) and the headless CLI (cli.py).
+Must not import Qt.
+"""
+import re
+import sys
+import copy
+import time
+import shutil
+import logging
+import threading
+import functools
+import importlib.util
+from contextlib import contextmanager
+
+import ffmpeg_probe
+import storage
+from cache import ENTRY_FIELDS, app_cache_dir, cache_key, slim_info
+from metrics import JobMetrics
+from progress import ProgressAggregator, describe_progress
+
+# yt_dlp itself is imported on first use (see ydl_class), it is by far the
+# slowest import of the application
+if importlib.util.find_spec('yt_dlp') is None:
+    print("yt-dlp library is not installed.")
+    print("Install it with: pip install --upgrade yt-dlp")
+    sys.exit(1)
+
+
+logger = logging.getLogger('youtube_downloader')
+
+# YouTube media URLs are signed for ~6 hours; refresh well before that
+SIGNED_URL_TTL = 6 * 3600
+SIGNED_URL_MARGIN = 10 * 60
+# Sync of a channel tab stops paging after this many already seen entries in a row
+SYNC_STOP_AFTER = 5
+
+# Minimum time between progress updates of one download (seconds)
+PROGRESS_INTERVAL = 0.25
+
+
+# Download performance settings (the GUI persists them with QSettings)
+DEFAULT_PERFORMANCE_SETTINGS = {
+    'concurrent_fragments': 4,          # DASH/HLS fragments downloaded in parallel
+    'http_chunk_size': 10 * 1024 ** 2,  # bytes per ranged request, 0 = single request
+    'external_downloader': '',          # '' = built-in, or e.g. 'aria2c' for DASH/HLS
+    'staging_dir': '',                  # temporary files, '' = .staging in the save folder
+}
+EXTERNAL_DOWNLOADER_ARGS = {
+    'aria2c': ['-x', '8', '-s', '8', '-k', '1M'],
+}
+
+
+def performance_ydl_opts(performance):
+    """
+    Translate performance settings into yt-dlp options
+    """
+    performance = {**DEFAULT_PERFORMANCE_SETTINGS, **(performance or {})}
+    opts = {'concurrent_fragment_downloads': max(1, performance['concurrent_fragments'])}
+    if performance['http_chunk_size']:
+        opts['http_chunk_size'] = performance['http_chunk_size']
+    downloader = performance['external_downloader']
+    if downloader and shutil.which(downloader):
+        # Only fragmented formats; progressive files keep the chunked built-in downloader
+        opts['external_downloader'] = {'dash': downloader, 'm3u8': downloader}
+        if downloader in EXTERNAL_DOWNLOADER_ARGS:
+            opts['external_downloader_args'] = {downloader: EXTERNAL_DOWNLOADER_ARGS[downloader]}
+    return opts
+
+
+_ydl_class = None
+_ydl_class_lock = threading.Lock()
+
+
+def ydl_class():
+    """
+    YoutubeDL subclass that counts extractor calls (including the ones
+    yt-dlp makes itself when resolving playlist entries) and calls
+    finished_hooks with the info dict of every video once it is downloaded
+    and post-processed. Unless a cookie file is given, all instances share
+    one cookie jar. Importing yt_dlp is deferred to the first call.
+    """
+    global _ydl_class
+    with _ydl_class_lock:
+        if _ydl_class is None:
+            import yt_dlp
+            from yt_dlp.cookies import YoutubeDLCookieJar
+
+            shared_cookies = YoutubeDLCookieJar()  # thread-safe, like any http.cookiejar
+
+            class CountingYoutubeDL(yt_dlp.YoutubeDL):
+                def __init__(self, *args, **kwargs):
+                    super().__init__(*args, **kwargs)
+                    self.extractor_calls = 0
+                    self.finished_hooks = []
+
+                @functools.cached_property
+                def cookiejar(self):
+                    if self.params.get('cookiefile') or self.params.get('cookiesfrombrowser'):
+                        return super().cookiejar
+                    return shared_cookies
+
+                def extract_info(self, url, *args, **kwargs):
+                    self.extractor_calls += 1
+                    return super().extract_info(url, *args, **kwargs)
+
+                def process_info(self, info_dict):
+                    super().process_info(info_dict)
+                    # Set by yt-dlp once the file is complete (or already existed)
+                    if info_dict.get('__write_download_archive') is True:
+                        for hook in self.finished_hooks:
+                            hook(info_dict)
+
+            _ydl_class = CountingYoutubeDL
+    return _ydl_class
+
+
+class YdlLogger:
+    """
+    yt-dlp logger: its messages go to the job metrics (retry counting) and
+    to the application log at debug level
+    """
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def debug(self, msg):
+        self.metrics.message(msg)
+        logger.debug("yt-dlp: %s", msg)
+
+    info = debug
+
+    def warning(self, msg):
+        self.metrics.message(msg)
+        logger.debug("yt-dlp warning: %s", msg)
+
+    def error(self, msg):
+        logger.debug("yt-dlp error: %s", msg)
+
+
+def create_ydl(opts):
+    # The player JS and the signature/nsig functions decrypted from it are
+    # cached on disk, so they are not rebuilt per session or per run
+    return ydl_class()({'cachedir': str(app_cache_dir() / 'yt-dlp'), **opts})
+
+
+class SessionPool:
+    """
+    Long-lived YoutubeDL sessions with the same options, borrowed by one
+    thread at a time: extractors stay initialized, their in-memory player
+    caches and the HTTP connections (keep-alive, with yt-dlp's requests
+    handler) are reused. Never blocks; when all sessions are busy a
+    throwaway one is created. At most size idle sessions are kept.
+    """
+    def __init__(self, opts, size=4):
+        self.opts = opts
+        self.size = size
+        self.lock = threading.Lock()
+        self.idle = []
+
+    @contextmanager
+    def session(self):
+        """
+        Borrow a session (its extractor_calls count starts at 0)
+        """
+        with self.lock:
+            ydl = self.idle.pop() if self.idle else None
+        if ydl is None:
+            ydl = create_ydl(self.opts)
+        ydl.extractor_calls = 0
+        try:
+            yield ydl
+        finally:
+            with self.lock:
+                keep = len(self.idle) < self.size
+                if keep:
+                    self.idle.append(ydl)
+            if not keep:
+                ydl.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for ydl in idle:
+            ydl.close()
+
+
+# Sessions for fetching video/playlist info (downloads set per-job options
+# that YoutubeDL fixes when it is created, so they get their own instance)
+extraction_sessions = SessionPool({
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+})
+
+
+def warm_up():
+    """
+    Import yt_dlp and set up an extraction session in a background thread
+    ahead of their first use
+    """
+    def run():
+        with extraction_sessions.session():
+            pass
+
+    threading.Thread(target=run, name='yt-dlp warm-up', daemon=True).start()
+
+
+# Relative cost of a byte of video per codec family: equally sized streams
+# prefer the more efficient codec (more picture for the same bytes)
+CODEC_COST = {
+    'av01': 0.85,
+    'vp9': 0.92,
+    'vp09': 0.92,
+    'avc1': 1.0,
+    'h264': 1.0,
+}
+UNKNOWN_CODEC_COST = 1.1
+
+# Video codecs each output container takes without re-encoding (None = any)
+CONTAINER_CODECS = {
+    'mp4': ('avc1', 'h264', 'av01', 'hev1', 'hvc1'),
+    'webm': ('vp9', 'vp09', 'vp8', 'av01'),
+    'mkv': None,
+}
+
+# Audio codecs each output container takes without re-encoding (None = any)
+AUDIO_CONTAINER_CODECS = {
+    'mp4': ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3'),
+    'webm': ('opus', 'vorbis'),
+    'mkv': None,
+    # Audio-only outputs
+    'm4a': ('mp4a', 'aac'),
+    'opus': ('opus',),
+    'mp3': ('mp3',),
+}
+# Source extension preferred for each audio-only output if the planned
+# stream is missing (playlist entries)
+AUDIO_OUTPUT_EXTS = {'m4a': 'm4a', 'opus': 'webm', 'mp3': None}
+
+
+def codec_family(codec):
+    return (codec or 'none').split('.')[0].lower()
+
+
+def estimate_size(f, duration=None):
+    """
+    Estimated bytes of one format: exact or approximate size, or else its
+    total bitrate (kbit/s) times the duration. None if nothing is known.
+    """
+    size = f.get('filesize') or f.get('filesize_approx')
+    if size:
+        return int(size)
+    if f.get('tbr') and duration:
+        return int(f['tbr'] * 1000 / 8 * duration)
+    return None
+
+
+def format_cost(candidate):
+    """
+    Ranking score of a video format candidate (lower is better): estimated
+    total bytes weighted by codec efficiency. Candidates without a size
+    estimate rank after all others.
+    """
+    cost = CODEC_COST.get(codec_family(candidate['vcodec']), UNKNOWN_CODEC_COST)
+    size = candidate.get('size')
+    return (size is None, (size or 0) * cost, cost)
+
+
+def fits_container(codec, output_format, table=CONTAINER_CODECS):
+    fitting = table.get(output_format)
+    return fitting is None or codec_family(codec) in fitting
+
+
+def choose_format(fmt, output_format=None):
+    """
+    Cheapest candidate of one collect_formats() quality for output_format,
+    as a dict with format_id, ext, vcodec, has_audio and size. Candidates
+    output_format takes by stream copy win over any that would have to be
+    re-encoded, however much smaller.
+    """
+    candidates = fmt.get('candidates')
+    if not candidates:
+        return fmt
+    fitting = [c for c in candidates if fits_container(c['vcodec'], output_format)]
+    return min(fitting or candidates, key=format_cost)
+
+
+def collect_audio_formats(entry):
+    """
+    Audio-only streams of a resolved video entry, best bitrate first
+    """
+    duration = entry.get('duration')
+    out = []
+    for f in entry.get('formats', []):
+        if f.get('acodec', 'none') != 'none' and f.get('vcodec', 'none') == 'none':
+            out.append({
+                'format_id': f.get('format_id', 'N/A'),
+                'ext': f.get('ext', 'unknown'),
+                'acodec': f['acodec'],
+                'abr': f.get('abr') or f.get('tbr'),
+                'size': estimate_size(f, duration),
+            })
+    out.sort(key=lambda a: a['abr'] or 0, reverse=True)
+    return out
+
+
+def collect_formats(entry, output_format=None):
+    """
+    Build the list of selectable video qualities for a resolved video entry.
+    Every quality keeps all its video streams as ranked candidates (see
+    choose_format) and describes the cheapest one for output_format, with
+    sizes estimated for the whole download (video plus bestaudio).
+    """
+    duration = entry.get('duration')
+    candidates = {}
+    for f in entry.get('formats', []):
+        format_id = f.get('format_id', 'N/A')
+        height = f.get('height')
+        vcodec = f.get('vcodec', 'none')
+        acodec = f.get('acodec', 'none')
+        ext = f.get('ext', 'unknown')
+        fps = f.get('fps', 0)
+
+        if height and vcodec != 'none':
+            quality_key = f"{height}p"
+            if fps and fps > 30:
+                quality_key += f" {fps}fps"
+            candidates.setdefault((quality_key, height), []).append({
+                'format_id': format_id,
+                'ext': ext,
+                'vcodec': vcodec,
+                'has_audio': acodec != 'none',
+                'video_size': estimate_size(f, duration),
+            })
+
+    # Estimate for the 'bestaudio' yt-dlp merges with video-only streams
+    audio = collect_audio_formats(entry)
+    audio_size = audio[0]['size'] if audio else None
+
+    out = []
+    for (quality, height), streams in sorted(candidates.items(), key=lambda x: x[0][1], reverse=True):
+        for stream in streams:
+            stream['size'] = stream['video_size']
+            if not stream['has_audio'] and stream['size'] is not None:
+                stream['size'] += audio_size or 0
+        best = choose_format({'candidates': streams}, output_format)
+        out.append({
+            'quality': quality,
+            'format_id': best['format_id'],
+            'ext': best['ext'],
+            'vcodec': best['vcodec'],
+            'has_audio': best['has_audio'],
+            'size': best['size'],
+            'candidates': streams,
+        })
+    return out
+
+
+def plan_merge(fmt, audio_formats, output_format):
+    """
+    Streams to download for one collect_formats() quality so that ffmpeg
+    merges them into output_format by stream copy only. Returns a dict:
+        format      yt-dlp format spec (falls back to bestaudio/best for
+                    playlist entries lacking the planned streams)
+        video       chosen video candidate
+        audio       chosen audio stream (None if the video has audio or
+                    no audio streams are known)
+        size        estimated bytes
+        transcode   reasons the streams cannot be stream-copied into
+                    output_format (empty for a pure copy merge)
+    """
+    video = choose_format(fmt, output_format)
+    transcode = []
+    if not fits_container(video.get('vcodec'), output_format):
+        transcode.append(f"video codec {codec_family(video['vcodec'])} does not fit {output_format}")
+
+    audio = None
+    if not video['has_audio'] and audio_formats:
+        fitting = [a for a in audio_formats if fits_container(a['acodec'], output_format, AUDIO_CONTAINER_CODECS)]
+        audio = fitting[0] if fitting else audio_formats[0]
+        if not fitting:
+            transcode.append(f"audio codec {codec_family(audio['acodec'])} does not fit {output_format}")
+
+    if video['has_audio']:
+        spec, size = video['format_id'], video.get('size')
+    elif audio is not None:
+        spec = f"{video['format_id']}+{audio['format_id']}/{video['format_id']}+bestaudio/best"
+        size = video['video_size'] + (audio['size'] or 0) if video.get('video_size') else None
+    else:
+        spec, size = f"{video['format_id']}+bestaudio/best", video.get('size')
+    return {'format': spec, 'video': video, 'audio': audio, 'size': size, 'transcode': transcode}
+
+
+def plan_audio(audio_formats, output_format, audio=None):
+    """
+    Audio-only counterpart of plan_merge: download a single audio stream
+    (audio, or the best one fitting output_format) and write it into an
+    m4a/opus/mp3 file, by stream copy when the codec fits. Returns a plan
+    dict with video None and audio_only True.
+    """
+    if audio is None:
+        fitting = [a for a in audio_formats if fits_container(a['acodec'], output_format, AUDIO_CONTAINER_CODECS)]
+        audio = (fitting or audio_formats)[0]
+    transcode = []
+    if not fits_container(audio['acodec'], output_format, AUDIO_CONTAINER_CODECS):
+        transcode.append(f"audio codec {codec_family(audio['acodec'])} does not fit {output_format}")
+    ext = AUDIO_OUTPUT_EXTS.get(output_format)
+    spec = f"{audio['format_id']}/bestaudio[ext={ext}]/bestaudio" if ext else f"{audio['format_id']}/bestaudio"
+    return {'format': spec, 'video': None, 'audio': audio, 'size': audio['size'],
+            'transcode': transcode, 'audio_only': True}
+
+
+def select_format(formats, quality='best'):
+    """
+    Pick one entry of collect_formats() output: 'best', 'worst', an exact
+    quality label ('1080p', '720p 60fps') or a height limit ('720', '720p'),
+    which selects the best format not above it. Returns None if formats is empty.
+    """
+    if not formats:
+        return None
+    if quality == 'best':
+        return formats[0]
+    if quality == 'worst':
+        return formats[-1]
+    for fmt in formats:
+        if fmt['quality'] == quality:
+            return fmt
+    match = re.match(r'(\d+)p?$', quality)
+    if match:
+        limit = int(match.group(1))
+        for fmt in formats:
+            if int(re.match(r'\d+', fmt['quality']).group()) <= limit:
+                return fmt
+        return formats[-1]
+    raise ValueError(f"Unknown quality: {quality}")
+
+
+def resolve_entry(ydl, entry):
+    """
+    Fully extract a flat playlist entry (only id/url/title are known after
+    flat extraction). Already resolved entries are returned as is.
+    """
+    if entry.get('formats'):
+        return entry
+    url = entry.get('url') or entry.get('webpage_url') or entry.get('id')
+    info = ydl.extract_info(url, download=False, ie_key=entry.get('ie_key'))
+    # Extracted on its own, the entry gets playlist fields set to None, which
+    # would keep the playlist's values from filling them in when downloading
+    for key in ('playlist', 'playlist_index'):
+        if info.get(key) is None:
+            info.pop(key, None)
+    return info
+
+
+def media_urls_expired(entry, margin=SIGNED_URL_MARGIN):
+    """
+    Check whether the signed media URLs of a resolved entry are expired
+    (or will expire within margin seconds)
+    """
+    now = time.time()
+    formats = entry.get('requested_formats') or entry.get('formats') or []
+    for f in formats:
+        match = re.search(r'[?&/]expire[=/](\d+)', f.get('url') or '')
+        if match:
+            return int(match.group(1)) - margin <= now
+    epoch = entry.get('epoch')
+    if epoch:
+        return epoch + SIGNED_URL_TTL - margin <= now
+    return True
+
+
+def drop_expired_entries(info):
+    """
+    Turn playlist entries with expired (or cached, format-less) media URLs
+    back into url stubs, so yt-dlp re-extracts only those when downloading
+    """
+    entries = info.get('entries') or []
+    for i, entry in enumerate(entries):
+        if isinstance(entry, dict) and entry.get('_type') != 'url' and media_urls_expired(entry):
+            entries[i] = compact_entry(entry)
+    return info
+
+
+def compact_entry(entry):
+    """
+    Compact url stub (cache.ENTRY_FIELDS) standing for a playlist entry
+    until it is downloaded: no formats, signed URLs or thumbnails
+    """
+    if entry.get('_type') not in ('url', 'url_transparent'):
+        entry = {
+            '_type': 'url',
+            'url': entry.get('webpage_url') or entry.get('id'),
+            'ie_key': entry.get('extractor_key'),
+            'id': entry.get('id'),
+            'title': entry.get('title'),
+            'duration': entry.get('duration'),
+            'uploader': entry.get('uploader'),
+        }
+    return {k: entry[k] for k in ENTRY_FIELDS if entry.get(k) is not None}
+
+
+def extract_listing(ydl, url):
+    """
+    Extract url without processing it, following plain redirects (e.g. a
+    channel page to its videos tab): the entries of a playlist are then
+    paged in lazily while iterated
+    """
+    info = ydl.extract_info(url, download=False, process=False)
+    for _ in range(3):
+        if info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = ydl.extract_info(info['url'], download=False, ie_key=info.get('ie_key'), process=False)
+    return info
+
+
+def stream_entries(info):
+    """
+    Yield the entries of an unprocessed playlist (see extract_listing) as
+    compact_entry() stubs (None for invalid ones) while they are paged in,
+    so the full entry dicts of only one page are alive at a time
+    """
+    listing = info.get('entries')
+    for entry in listing if listing is not None else ():
+        yield compact_entry(entry) if isinstance(entry, dict) else None
+
+
+def playlist_entries(info):
+    """
+    Yield (playlist_index, entry) for the valid dict entries of a playlist info
+    """
+    entries = info.get('entries') or []
+    indexes = info.get('requested_entries') or range(1, len(entries) + 1)
+    for index, entry in zip(indexes, entries):
+        if isinstance(entry, dict):
+            yield index, entry
+
+
+def playlist_extra_info(info, index):
+    """
+    Playlist fields for downloading a single entry on its own, so output
+    templates like %(playlist_index)s resolve as in a whole-playlist download
+    """
+    return {
+        'playlist': info.get('title') or info.get('id'),
+        'playlist_id': info.get('id'),
+        'playlist_title': info.get('title'),
+        'playlist_index': index,
+        'n_entries': len(info.get('entries') or []),
+        # yt-dlp pads playlist_index to the width of the last index
+        '__last_playlist_index': max(info.get('requested_entries') or (len(info.get('entries') or []),)),
+    }
+
+
+def required_space(plan, info, output_index=None):
+    """
+    Free bytes needed to download info (a fetch_info result) with plan; for
+    a playlist, for its entries not complete in output_index
+    (archive.OutputIndex) yet. 0 if the plan has no size estimate.
+    """
+    entries = preview = None
+    if info is not None and info.get('_type') == 'playlist':
+        entries = [entry for _, entry in playlist_entries(info)
+                   if output_index is None or not output_index.is_complete_entry(entry)]
+        preview = next((e for e in entries if e.get('processed_formats') is not None), None)
+    return storage.required_bytes(plan, storage.estimate_bytes(plan, entries, preview))
+
+
+class SingleFlight:
+    """
+    Merges concurrent calls for the same key into one: the first caller
+    runs the work, callers arriving meanwhile wait for it and share its
+    result (or exception)
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}  # key -> [done event, result, exception]
+
+    def do(self, key, fn):
+        """
+        Return (fn() or the result of the call in flight for key, shared)
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = [threading.Event(), None, None]
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1], True
+        try:
+            call[1] = fn()
+        except BaseException as e:
+            call[2] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call[0].set()
+        return call[1], False
+
+
+_info_flights = SingleFlight()
+
+
+def fetch_info(url, cache=None, skip_entry=None):
+    """
+    Fetch video/playlist info for url and return (info, extractor_calls).
+    Playlists are enumerated flat, their entries streamed into compact
+    stubs (see compact_entry): only the first entry is fully resolved
+    (for its formats), the rest are resolved when downloading. Entries for
+    which skip_entry(entry) is true (e.g. already downloaded) are not resolved.
+    Results are served from / stored in the metadata cache if one is given.
+    Concurrent requests for the same video or playlist, in whatever URL
+    shape, share one extraction (the callers joining it get a copy).
+    """
+    key = cache_key(url)
+    if key is None:
+        return _fetch_info(url, cache, skip_entry)
+    (info, calls), shared = _info_flights.do(key, lambda: _fetch_info(url, cache, skip_entry))
+    if shared:
+        info = copy.deepcopy(info)
+        return info, ensure_preview(info, skip_entry)
+    return info, calls
+
+
+def _fetch_info(url, cache, skip_entry):
+    key = cache_key(url) if cache else None
+    if key:
+        info = cache.get(key)
+        if info is not None:
+            logger.info("Info for %s: served from cache %s", url, cache.stats())
+            return info, ensure_preview(info, skip_entry)
+
+    with extraction_sessions.session() as ydl:
+        info = extract_listing(ydl, url)
+        if info.get('_type') == 'playlist':
+            # Any number of entries, kept as compact stubs
+            info['entries'] = list(stream_entries(info))
+        else:
+            info = ydl.process_ie_result(info, download=False)
+        resolve_preview(ydl, info, skip_entry)
+        calls = ydl.extractor_calls  # the session goes back to the pool
+
+    logger.info("Info for %s: %d extractor call(s)", url, calls)
+    if key:
+        cache.put(key, slim_info(info))
+    return info, calls
+
+
+def resolve_preview(ydl, info, skip_entry=None):
+    """
+    Add processed_formats/processed_audio to a video info, or for a
+    playlist to its first valid dict entry still to download (entries
+    keep their positions so playlist indexes stay valid)
+    """
+    if info.get('_type') == 'playlist' and info.get('entries'):
+        entries = list(info['entries'])
+        for i, entry in enumerate(entries):
+            if isinstance(entry, dict) and not (skip_entry and skip_entry(entry)):
+                entries[i] = resolve_entry(ydl, entry)
+                entries[i]['processed_formats'] = collect_formats(entries[i])
+                entries[i]['processed_audio'] = collect_audio_formats(entries[i])
+                break
+        info['entries'] = entries
+    else:
+        info['processed_formats'] = collect_formats(info)
+        info['processed_audio'] = collect_audio_formats(info)
+
+
+def ensure_preview(info, skip_entry=None):
+    """
+    Resolve the preview entry of a cached or shared playlist info again if
+    none of its entries still to download has it: the entry resolved by the
+    fetch it came from may be skipped here (already downloaded to another
+    save folder). Returns the extractor calls made.
+    """
+    if info.get('_type') != 'playlist':
+        return 0
+    for entry in info.get('entries') or []:
+        if (isinstance(entry, dict) and entry.get('processed_formats') is not None
+                and not (skip_entry and skip_entry(entry))):
+            return 0
+    with extraction_sessions.session() as ydl:
+        resolve_preview(ydl, info, skip_entry)
+        return ydl.extractor_calls
+
+
+def sync_key(info, url):
+    """
+    Key of a playlist or channel tab for sync.SyncState: the canonical
+    playlist key, else the listing's own URL (a channel's videos and
+    shorts tabs share its ID)
+    """
+    webpage_url = info.get('webpage_url') or url
+    return cache_key(webpage_url) or webpage_url
+
+
+def fetch_new_entries(url, state, skip_entry=None, stop_after=SYNC_STOP_AFTER):
+    """
+    Incremental sync of a playlist or channel: page through its listing
+    and keep the entries not seen before (state is a sync.SyncState).
+    Channel tabs and other listings are taken to be newest first: paging
+    stops once stop_after entries in a row were seen before, so only the
+    pages with new uploads are requested. YouTube playlists (list=) add
+    videos at the end and are walked to it. Returns (info,
+    extractor_calls) like fetch_info, with only the new entries
+    (requested_entries keeps their listing positions) and
+    info['sync_key']; the metadata cache is not used.
+    """
+    with extraction_sessions.session() as ydl:
+        info = extract_listing(ydl, url)
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            raise ValueError("Only playlists and channels can be synced")
+
+        key = sync_key(info, url)
+        known = state.known(key)
+        # Oldest first: removed or private videos make counts unreliable,
+        # the only way not to miss appended ones is to page to the end
+        stop_early = not key.startswith('playlist:')
+        entries, indexes = [], []
+        known_run = walked = 0
+        for walked, entry in enumerate(stream_entries(info), 1):
+            if entry is None or not entry.get('id'):
+                continue
+            if entry['id'] not in known:
+                known_run = 0
+                entries.append(entry)
+                indexes.append(walked)
+                continue
+            known_run += 1
+            if stop_early and known_run >= stop_after:
+                break
+
+        info = {k: v for k, v in info.items() if k != 'entries'}
+        info.update(_type='playlist', entries=entries, requested_entries=indexes, sync_key=key)
+        resolve_preview(ydl, info, skip_entry)
+        calls = ydl.extractor_calls
+
+    logger.info("Sync of %s: %d new of %d entries walked (%d seen before), %d extractor call(s)",
+                url, len(entries), walked, len(known), calls)
+    return info, calls
+
+
+def download_error_message(error):
+    msg = str(error)
+    if 'ffmpeg' in msg.lower():
+        msg += "\n\nFFmpeg is required for merging video/audio. Install FFmpeg:\nWindows: ffmpeg.org\nLinux: sudo apt install ffmpeg\nMac: brew install ffmpeg"
+    return msg
+
+
+class Downloader:
+    """
+    Downloads one video/playlist (the work behind DownloadThread).
+    If info (as produced by fetch_info) is given, the download reuses
+    it instead of extracting the URL again; a single video without usable
+    info (or with a url stub) is extracted in a pooled session (see
+    extraction_sessions). extra_info is merged into the extracted info
+    (e.g. the playlist fields of a single playlist entry).
+    With an archive (archive.DownloadArchive), videos already downloaded to
+    output_path are skipped before extraction and finished ones recorded.
+    With a merge_plan (see plan_merge) its streams are downloaded instead of
+    format_id+bestaudio, re-encoding through an intermediate MKV only when
+    the plan says stream copy is impossible. An audio-only plan (see
+    plan_audio) downloads one audio stream and extracts it into output_format.
+    Temporary files go to a staging folder on the filesystem of output_path
+    (see storage.staging_dir) and the estimated size of the plan is checked
+    against (and held on) the free space before anything is downloaded;
+    storage.NotEnoughSpace is raised if it does not fit. on_progress(percent, message)
+    and on_stage('running'/'merging') are called from the downloading thread.
+    postprocess_times maps each ffmpeg post-processor to its run time (s);
+    metrics (metrics.JobMetrics) holds the timings of the last run().
+    """
+    def __init__(self, url, format_id, output_path, output_format, has_audio, is_playlist=False,
+                 info=None, extractor_calls=0, extra_info=None, performance=None,
+                 on_progress=None, on_stage=None, archive=None, merge_plan=None):
+        self.url = url
+        self.format_id = format_id
+        self.output_path = output_path
+        self.output_format = output_format
+        self.has_audio = has_audio
+        self.is_playlist = is_playlist
+        self.info = info
+        self.extractor_calls = extractor_calls  # calls already spent on this job
+        self.extra_info = extra_info or {}
+        self.performance = performance
+        self.archive = archive
+        self.merge_plan = merge_plan
+        self.postprocess_times = {}
+        self.metrics = JobMetrics(url)
+        self.on_progress = on_progress or (lambda percent, message: None)
+        self.on_stage = on_stage or (lambda stage: None)
+        self.last_progress = None  # latest ProgressAggregator snapshot
+
+    def run(self):
+        metrics = self.metrics = JobMetrics(self.url)
+        current_stage = [None]
+
+        def set_stage(stage):
+            if current_stage[0] != stage:
+                current_stage[0] = stage
+                self.on_stage(stage)
+
+        def emit_progress(snapshot):
+            self.last_progress = snapshot
+            self.on_progress(int(snapshot['percent']), describe_progress(snapshot))
+
+        # At most one progress update per PROGRESS_INTERVAL per job
+        aggregator = ProgressAggregator(emit_progress, interval=PROGRESS_INTERVAL,
+                                        playlist=self.is_playlist)
+
+        claim = [None]  # storage.Claim of the running download
+
+        def progress_hook(d):
+            status = d.get('status')
+            if status == 'downloading':
+                set_stage('running')
+            elif status == 'finished':
+                set_stage('merging')
+            aggregator.hook(d)
+            metrics.progress(d)
+            if claim[0] is not None:
+                claim[0].progress(d)
+
+        pp_started = {}
+
+        def postprocessor_hook(d):
+            name = d.get('postprocessor')
+            if d.get('status') == 'started':
+                set_stage('merging')
+                pp_started[name] = time.monotonic()
+            elif d.get('status') == 'finished' and name in pp_started:
+                elapsed = time.monotonic() - pp_started.pop(name)
+                self.postprocess_times[name] = self.postprocess_times.get(name, 0) + elapsed
+
+        if self.merge_plan is not None:
+            fmt = self.merge_plan['format']
+        elif self.has_audio:
+            fmt = self.format_id
+        else:
+            fmt = f"{self.format_id}+bestaudio/best"
+
+        outtmpl = '%(title)s.%(ext)s'
+        if self.is_playlist or 'playlist_index' in self.extra_info:
+            outtmpl = '%(playlist_index)s - %(title)s.%(ext)s'
+        performance = {**DEFAULT_PERFORMANCE_SETTINGS, **(self.performance or {})}
+        staging = storage.staging_dir(self.output_path, performance['staging_dir'])
+
+        ydl_opts = {
+            'format': fmt,
+            'outtmpl': outtmpl,
+            # Parts and fragments are staged on the same filesystem, so the
+            # finished file is moved into output_path by a rename
+            'paths': {'home': self.output_path, 'temp': staging},
+            'merge_output_format': self.output_format,
+            'progress_hooks': [progress_hook],
+            'postprocessor_hooks': [postprocessor_hook],
+            'logger': YdlLogger(metrics),
+            'noprogress': True,
+            # Whole playlists are downloaded without holding the info of every entry
+            'extract_flat': 'discard',
+            'quiet': True,
+            'no_warnings': True,
+            'continuedl': True,
+            'retries': 10,
+            'fragment_retries': 10,
+            **performance_ydl_opts(self.performance),
+        }
+
+        # Fallback if FFmpeg missing
+        audio_only = self.merge_plan is not None and self.merge_plan.get('audio_only')
+        ffmpeg = ffmpeg_probe.probe()['ffmpeg']
+        if ffmpeg:
+            ydl_opts['ffmpeg_location'] = ffmpeg
+        elif not audio_only:
+            self.on_progress(0, "Warning: FFmpeg not found, using best single-format...")
+            ydl_opts['format'] = 'best'
+
+        if audio_only:
+            # A single stream: nothing to merge, kept in its own container without ffmpeg
+            del ydl_opts['merge_output_format']
+            if ffmpeg:
+                # Copies the stream as is when its codec fits output_format
+                ydl_opts['postprocessors'] = [{'key': 'FFmpegExtractAudio',
+                                               'preferredcodec': self.output_format}]
+        elif ffmpeg and self.merge_plan is not None and self.merge_plan['transcode']:
+            # Stream copy into MKV always works; re-encode from there
+            ydl_opts['merge_output_format'] = 'mkv'
+            ydl_opts['postprocessors'] = [{'key': 'FFmpegVideoConvertor', 'preferedformat': self.output_format}]
+
+        if self.info is not None and self.info.get('requested_entries'):
+            # Entries listed at their playlist positions (e.g. the new ones of a
+            # sync): yt-dlp has to be told which positions are there
+            ydl_opts['playlist_items'] = ','.join(map(str, self.info['requested_entries']))
+
+        output_index = None
+        if self.archive is not None:
+            # yt-dlp checks this set before extracting playlist entries
+            output_index = self.archive.index(self.output_path)
+            ydl_opts['download_archive'] = output_index.archive_ids()
+
+        needed = required_space(self.merge_plan, self.info, output_index) if self.merge_plan else 0
+
+        with create_ydl(ydl_opts) as ydl:
+            ydl.finished_hooks.append(lambda info: metrics.file_written(info.get('filepath')))
+            if self.archive is not None:
+                ydl.finished_hooks.append(lambda info: self.archive.record(info, self.output_path))
+            success = False
+            try:
+                with storage.disk_space.claim(self.output_path, needed) as held, storage.staging_folders.use(staging):
+                    claim[0] = held
+                    info = self.info
+                    if info is not None:
+                        if info.get('_type') == 'playlist':
+                            info = drop_expired_entries(info)
+                        elif info.get('_type') not in ('url', 'url_transparent') and media_urls_expired(info):
+                            info = None
+                    if not self.is_playlist and (info is None or info.get('_type') in ('url', 'url_transparent')):
+                        info = self.resolve(info, output_index)
+                    if info is None:
+                        ydl.extract_info(self.url, download=True, extra_info=self.extra_info)
+                    else:
+                        ydl.process_ie_result(info, download=True, extra_info=self.extra_info)
+                success = True
+            finally:
+                metrics.finish(success, self.postprocess_seconds)
+                self.extractor_calls += ydl.extractor_calls
+                logger.info("Download job %s: %d extractor call(s) (%d during download)",
+                            self.url, self.extractor_calls, ydl.extractor_calls)
+                if self.postprocess_times:
+                    logger.info("Download job %s: post-processing took %.2fs (%s)", self.url,
+                                self.postprocess_seconds,
+                                ", ".join(f"{name} {t:.2f}s" for name, t in self.postprocess_times.items()))
+
+    def resolve(self, stub, output_index=None):
+        """
+        Extract a single video job without (usable) info in a pooled
+        extraction session rather than in the per-job instance. Returns the
+        stub as is if output_index has it, yt-dlp then skips it unextracted.
+        """
+        stub = stub or {'url': self.url}
+        if output_index is not None and stub.get('id') and output_index.is_complete_entry(stub):
+            return stub
+        with extraction_sessions.session() as session:
+            try:
+                return resolve_entry(session, stub)
+            finally:
+                self.extractor_calls += session.extractor_calls
+
+    @property
+    def postprocess_seconds(self):
+        return sum(self.postprocess_times.values())
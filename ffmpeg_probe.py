@@ -0,0 +1,132 @@
+"""
+FFmpeg capability probe: ffmpeg/ffprobe paths, version, muxers and codecs.
+Probed once (in the background at startup), cached in memory and on disk,
+and re-probed only when the ffmpeg binary changes.
+"""
+import os
+import json
+import shutil
+import threading
+import subprocess
+
+from cache import app_cache_dir
+
+# Output containers offered in the GUI and the ffmpeg muxer each one needs
+CONTAINER_MUXERS = {
+    'mp4': 'mp4',
+    'mkv': 'matroska',
+    'webm': 'webm',
+}
+AUDIO_CONTAINER_MUXERS = {
+    'm4a': 'ipod',
+    'opus': 'opus',
+    'mp3': 'mp3',
+}
+
+_lock = threading.Lock()
+_capabilities = None
+_probe_thread = None
+
+
+def _fingerprint(path):
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.realpath(path), stat.st_mtime, stat.st_size]
+
+
+def _run(args):
+    try:
+        return subprocess.run(args, capture_output=True, text=True, timeout=10).stdout
+    except Exception:
+        return ""
+
+
+def _parse_list(output, flags_width):
+    """
+    Names from `ffmpeg -muxers` / `-codecs` style listings
+    (' <flags> <name> <description>' after a ' --' separator line)
+    """
+    names = []
+    started = False
+    for line in output.splitlines():
+        if line.strip().startswith('--'):
+            started = True
+            continue
+        parts = line.split()
+        if started and len(parts) >= 2 and len(parts[0]) <= flags_width:
+            names.extend(parts[1].split(','))
+    return sorted(set(names))
+
+
+def _probe(ffmpeg):
+    version_line = _run([ffmpeg, '-version']).splitlines()[:1]
+    return {
+        'ffmpeg': ffmpeg,
+        'ffprobe': shutil.which('ffprobe'),
+        'version': version_line[0] if version_line else "",
+        'muxers': _parse_list(_run([ffmpeg, '-hide_banner', '-muxers']), 2),
+        'codecs': _parse_list(_run([ffmpeg, '-hide_banner', '-codecs']), 6),
+        'fingerprint': _fingerprint(ffmpeg),
+    }
+
+
+def _cache_file():
+    return app_cache_dir() / 'ffmpeg.json'
+
+
+def probe():
+    """
+    Current capabilities; probes ffmpeg only if the binary changed since
+    the last (in-memory or on-disk) result
+    """
+    global _capabilities
+    with _lock:
+        ffmpeg = shutil.which('ffmpeg')
+        fingerprint = _fingerprint(ffmpeg)
+        if _capabilities is not None and _capabilities['fingerprint'] == fingerprint:
+            return _capabilities
+        if ffmpeg is None:
+            _capabilities = {'ffmpeg': None, 'ffprobe': shutil.which('ffprobe'), 'version': "",
+                             'muxers': [], 'codecs': [], 'fingerprint': None}
+            return _capabilities
+        try:
+            cached = json.loads(_cache_file().read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            cached = None
+        if cached and cached.get('fingerprint') == fingerprint:
+            _capabilities = cached
+        else:
+            _capabilities = _probe(ffmpeg)
+            try:
+                _cache_file().write_text(json.dumps(_capabilities), encoding='utf-8')
+            except OSError:
+                pass
+        return _capabilities
+
+
+def probe_in_background():
+    """
+    Start probing in a daemon thread (at application startup)
+    """
+    global _probe_thread
+    _probe_thread = threading.Thread(target=probe, name='ffmpeg probe', daemon=True)
+    _probe_thread.start()
+
+
+def ffmpeg_available():
+    return probe()['ffmpeg'] is not None
+
+
+def supported_containers(containers=CONTAINER_MUXERS):
+    """
+    Output containers ffmpeg can mux (all of them if ffmpeg is missing,
+    as nothing is merged then)
+    """
+    capabilities = probe()
+    if capabilities['ffmpeg'] is None or not capabilities['muxers']:
+        return list(containers)
+    return [name for name, muxer in containers.items() if muxer in capabilities['muxers']]
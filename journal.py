@@ -0,0 +1,73 @@
+"""
+Job journal: queued and in-flight downloads written ahead to disk, so the
+queue survives a crash or restart and resumes where it stopped.
+"""
+import json
+import time
+
+from cache import SQLiteStore, app_data_dir
+
+
+class JobJournal(SQLiteStore):
+    """
+    Persistent (SQLite, WAL) record of download jobs. A job is a dict of
+    the fields needed to run it again (URL, format, container, output
+    folder, ...) plus its state; playlist jobs store one child row per
+    entry, so finished entries are known individually.
+    """
+    # Every committed state change must survive a power loss
+    pragmas = ('synchronous = FULL',)
+
+    def __init__(self, path=None):
+        super().__init__(path or app_data_dir() / 'jobs.sqlite3')
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                       "id INTEGER PRIMARY KEY AUTOINCREMENT, parent INTEGER, "
+                       "data TEXT NOT NULL, state TEXT NOT NULL, created REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_parent ON jobs (parent)")
+
+    def add(self, fields, state, children=()):
+        """
+        Journal a job and its (fields, state) children in one transaction;
+        returns (job id, [child ids])
+        """
+        now = time.time()
+        with self.locked() as db:
+            job_id = db.execute("INSERT INTO jobs (parent, data, state, created) VALUES (NULL, ?, ?, ?)",
+                                (json.dumps(fields, ensure_ascii=False), state, now)).lastrowid
+            child_ids = [
+                db.execute("INSERT INTO jobs (parent, data, state, created) VALUES (?, ?, ?, ?)",
+                           (job_id, json.dumps(child, ensure_ascii=False), child_state, now)).lastrowid
+                for child, child_state in children
+            ]
+        return job_id, child_ids
+
+    def set_state(self, job_id, state):
+        with self.locked() as db:
+            db.execute("UPDATE jobs SET state = ? WHERE id = ?", (state, job_id))
+
+    def remove(self, job_id):
+        """
+        Forget a job and its children
+        """
+        with self.locked() as db:
+            db.execute("DELETE FROM jobs WHERE id = ? OR parent = ?", (job_id, job_id))
+
+    def pending(self):
+        """
+        Journaled jobs in the order they were added: dicts of their fields
+        with 'id', 'state' and 'children' (a list of such dicts)
+        """
+        with self.locked() as db:
+            rows = db.execute("SELECT id, parent, data, state FROM jobs ORDER BY id").fetchall()
+        jobs = {}
+        out = []
+        for job_id, parent, data, state in rows:
+            job = {**json.loads(data), 'id': job_id, 'state': state, 'children': []}
+            if parent is None:
+                jobs[job_id] = job
+                out.append(job)
+            elif parent in jobs:
+                jobs[parent]['children'].append(job)
+        return out
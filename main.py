@@ -9,100 +9,391 @@ if getattr(sys, 'frozen', False):
 
 
 from pathlib import Path
+import PySide6
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                                QProgressBar, QFileDialog, QComboBox,
                                QGroupBox, QCheckBox, QMessageBox, QDialog,
-                               QRadioButton, QButtonGroup)
-from PySide6.QtCore import Qt, QThread, Signal
-from PySide6.QtGui import QFont, QPixmap
-from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
-from urllib.parse import urlparse, parse_qs
-import subprocess
+                               QRadioButton, QButtonGroup, QSpinBox, QTableView,
+                               QHeaderView, QStyle,
+                               QStyleOptionProgressBar, QListWidget, QListWidgetItem)
+from PySide6.QtCore import (Qt, QThread, Signal, QObject, QAbstractTableModel,
+                            QModelIndex, QSettings, QRunnable, QThreadPool, QBuffer,
+                            QIODevice, QSize, QTimer)
+from PySide6.QtGui import QFont, QPixmap, QImage, QPainter
+from collections import OrderedDict, deque
 import shutil
-
-try:
-    import yt_dlp
-except ImportError:
-    print("yt-dlp library is not installed.")
-    print("Install it with: pip install --upgrade yt-dlp")
-    sys.exit(1)
+import time
+import logging
+
+import ffmpeg_probe
+from archive import DownloadArchive, normalize_dir
+from cache import MetadataCache, ThumbnailStore, cache_key
+from ffmpeg_probe import AUDIO_CONTAINER_MUXERS, supported_containers
+from journal import JobJournal
+from metrics import MetricsSink
+from sync import SyncState
+from urls import canonicalize, video_id as url_video_id
+from progress import format_bytes
+from storage import RESERVE_BYTES, STAGING_DIRNAME, NotEnoughSpace, clean_staging, free_bytes, staging_dir
+from core import (DEFAULT_PERFORMANCE_SETTINGS, EXTERNAL_DOWNLOADER_ARGS, Downloader,
+                  download_error_message, fetch_info, fetch_new_entries, plan_audio, plan_merge,
+                  playlist_entries, playlist_extra_info, required_space, warm_up)
+
+
+# Releases that crash the app (bool_dealloc / none_dealloc), see main()
+BROKEN_PYSIDE_VERSIONS = {'6.12.0'}
+
+OUTPUT_FORMATS = [
+    ("MP4 (H.264 - Best compatibility)", "mp4"),
+    ("MKV (Matroska - High quality)", "mkv"),
+    ("WEBM (VP9 - Web optimized)", "webm"),
+]
+AUDIO_OUTPUT_FORMATS = [
+    ("M4A (AAC - Best compatibility)", "m4a"),
+    ("OPUS (Smallest files)", "opus"),
+    ("MP3 (Re-encoded)", "mp3"),
+]
+HTTP_CHUNK_SIZES = [
+    ("Off (single request)", 0),
+    ("1 MB", 1024 ** 2),
+    ("10 MB", 10 * 1024 ** 2),
+    ("50 MB", 50 * 1024 ** 2),
+]
+
+
+def load_performance_settings():
+    settings = QSettings("YouTubeDownloader", "YouTubeDownloader")
+    return {
+        'concurrent_fragments': settings.value('performance/concurrent_fragments',
+                                               DEFAULT_PERFORMANCE_SETTINGS['concurrent_fragments'], type=int),
+        'http_chunk_size': settings.value('performance/http_chunk_size',
+                                          DEFAULT_PERFORMANCE_SETTINGS['http_chunk_size'], type=int),
+        'external_downloader': settings.value('performance/external_downloader',
+                                              DEFAULT_PERFORMANCE_SETTINGS['external_downloader'], type=str),
+        'staging_dir': settings.value('performance/staging_dir',
+                                      DEFAULT_PERFORMANCE_SETTINGS['staging_dir'], type=str),
+    }
+
+
+def save_performance_settings(performance):
+    settings = QSettings("YouTubeDownloader", "YouTubeDownloader")
+    for key, value in performance.items():
+        settings.setValue(f'performance/{key}', value)
 
 
 class VideoInfoThread(QThread):
     """
-    Thread to fetch video/playlist info without blocking the UI
+    Thread to fetch video/playlist info without blocking the UI.
+    Playlists are enumerated flat: only the entry shown in the format
+    dialog is fully resolved, the rest are resolved when downloading.
+    Results are served from / stored in the metadata cache if one is given,
+    and the extraction latency is recorded to metrics (a MetricsSink).
+    With a sync_state (sync.SyncState) a playlist or channel URL only gets
+    the entries added since its last sync (see core.fetch_new_entries).
     """
     info_ready = Signal(dict)  # video information dictionary
     error = Signal(str)        # error message
 
-    def __init__(self, url):
+    def __init__(self, url, cache=None, skip_entry=None, metrics=None, prefetched=None, sync_state=None):
         super().__init__()
         self.url = url
+        self.cache = cache
+        self.skip_entry = skip_entry
+        self.metrics = metrics
+        self.prefetched = prefetched  # (info, extractor_calls) from MetadataPrefetcher
+        self.sync_state = sync_state
+        self.extractor_calls = 0
 
     def run(self):
+        if self.prefetched is not None:
+            info, self.extractor_calls = self.prefetched
+            self.info_ready.emit(info)
+            return
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-
-                # If playlist, take first valid dict entry
-                if info.get('_type') == 'playlist' and info.get('entries'):
-                    dict_entries = [e for e in info['entries'] if isinstance(e, dict)]
-                    if dict_entries:
-                        info = dict_entries[0]
-
-                processed_formats = []
-
-                def collect_formats(entry):
-                    video_formats = {}
-                    audio_formats = []
-                    for f in entry.get('formats', []):
-                        format_id = f.get('format_id', 'N/A')
-                        height = f.get('height')
-                        vcodec = f.get('vcodec', 'none')
-                        acodec = f.get('acodec', 'none')
-                        ext = f.get('ext', 'unknown')
-                        fps = f.get('fps', 0)
-
-                        if height and vcodec != 'none':
-                            quality_key = f"{height}p"
-                            if fps and fps > 30:
-                                quality_key += f" {fps}fps"
-                            if quality_key not in video_formats:
-                                video_formats[quality_key] = {
-                                    'format_id': format_id,
-                                    'height': height,
-                                    'ext': ext,
-                                    'has_audio': acodec != 'none'
-                                }
-
-                        if acodec != 'none' and vcodec == 'none':
-                            audio_formats.append(format_id)
-
-                    sorted_formats = sorted(video_formats.items(), key=lambda x: x[1]['height'] or 0, reverse=True)
-                    out = []
-                    for quality, data in sorted_formats:
-                        out.append({
-                            'quality': quality,
-                            'format_id': data['format_id'],
-                            'ext': data['ext'],
-                            'has_audio': data['has_audio']
-                        })
-                    return out
-
-                processed_formats = collect_formats(info)
-                info['processed_formats'] = processed_formats
-                self.info_ready.emit(info)
-
+            started = time.monotonic()
+            key = cache_key(self.url)
+            if self.sync_state is not None and not (key and key.startswith('video:')):
+                info, self.extractor_calls = fetch_new_entries(self.url, self.sync_state, self.skip_entry)
+            else:
+                info, self.extractor_calls = fetch_info(self.url, self.cache, self.skip_entry)
+            if self.metrics is not None:
+                self.metrics.record_extraction(self.url, time.monotonic() - started,
+                                               self.extractor_calls, cached=self.extractor_calls == 0)
+            self.info_ready.emit(info)
         except Exception as e:
             self.error.emit(f"Error fetching video info: {str(e)}")
 
 
 
+# Thumbnail variants on i.ytimg.com, best first (maxresdefault is often missing)
+THUMBNAIL_SOURCES = ('maxresdefault', 'sddefault', 'hqdefault', 'mqdefault', 'default')
+# Pre-scaled sizes kept in the caches
+THUMBNAIL_SIZES = {
+    'dialog': (560, 315),  # FormatSelectionDialog
+    'row': (80, 45),       # download queue table
+}
+
+
+class ThumbnailTask(QRunnable):
+    """
+    Loads, decodes and pre-scales the thumbnail of one video off the GUI
+    thread (disk store first, then the i.ytimg.com variants in turn)
+    """
+    def __init__(self, loader, video_id):
+        super().__init__()
+        self.loader = loader
+        self.video_id = video_id
+
+    def run(self):
+        images = {}
+        store = self.loader.store
+        for size in THUMBNAIL_SIZES:
+            data = store.get(self.video_id, size)
+            image = QImage.fromData(data) if data else QImage()
+            if not image.isNull():
+                images[size] = image
+
+        if len(images) < len(THUMBNAIL_SIZES):
+            source = self.download()
+            if source is not None:
+                for size, (width, height) in THUMBNAIL_SIZES.items():
+                    if size in images:
+                        continue
+                    image = source.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                    images[size] = image
+                    buffer = QBuffer()
+                    buffer.open(QIODevice.WriteOnly)
+                    image.save(buffer, 'JPG', 90)
+                    store.put(self.video_id, size, bytes(buffer.data()))
+
+        self.loader.results.append((self.video_id, images))
+
+    def download(self):
+        from urllib.request import urlopen
+
+        for variant in THUMBNAIL_SOURCES:
+            url = f"https://i.ytimg.com/vi/{self.video_id}/{variant}.jpg"
+            try:
+                with urlopen(url, timeout=10) as response:
+                    image = QImage.fromData(response.read())
+            except Exception:
+                continue
+            if not image.isNull():
+                return image
+        return None
+
+
+class ThumbnailLoader(QObject):
+    """
+    Thumbnail subsystem: bounded in-memory LRU of pre-scaled pixmaps on top
+    of the on-disk ThumbnailStore, filled by ThumbnailTask workers. The
+    workers hand their images over in a deque that a GUI thread timer
+    collects while any are pending, rather than through a signal each.
+    """
+    thumbnail_ready = Signal(str)      # video id (only for requests with notify)
+
+    def __init__(self, capacity=512, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self.store = ThumbnailStore()
+        self.memory = OrderedDict()    # (video id, size) -> QPixmap
+        self.pending = set()
+        self.failed = set()
+        self.notify = set()            # pending video ids to emit thumbnail_ready for
+        self.results = deque()         # (video id, {size: QImage}) from the workers
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(4)
+        self.collect_timer = QTimer(self)
+        self.collect_timer.setInterval(50)
+        self.collect_timer.timeout.connect(self.collect)
+
+    def pixmap(self, video_id, size):
+        pixmap = self.memory.get((video_id, size))
+        if pixmap is not None:
+            self.memory.move_to_end((video_id, size))
+        return pixmap
+
+    def request(self, video_id, notify=False):
+        """
+        Load the thumbnail of video_id unless it is in memory already;
+        with notify, thumbnail_ready is emitted once it is
+        """
+        if (not video_id or video_id in self.failed
+                or all((video_id, size) in self.memory for size in THUMBNAIL_SIZES)):
+            return
+        if notify:
+            self.notify.add(video_id)
+        if video_id in self.pending:
+            return
+        self.pending.add(video_id)
+        self.pool.start(ThumbnailTask(self, video_id))
+        if not self.collect_timer.isActive():
+            self.collect_timer.start()
+
+    def collect(self):
+        while self.results:
+            self.on_loaded(*self.results.popleft())
+        if not self.pending:
+            self.collect_timer.stop()
+
+    def on_loaded(self, video_id, images):
+        self.pending.discard(video_id)
+        if not images:
+            self.failed.add(video_id)
+            self.notify.discard(video_id)
+            return
+        for size, image in images.items():
+            # QPixmap must be created on the GUI thread
+            self.memory[(video_id, size)] = QPixmap.fromImage(image)
+            self.memory.move_to_end((video_id, size))
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+        if video_id in self.notify:
+            self.notify.discard(video_id)
+            self.thumbnail_ready.emit(video_id)
+
+
+class PrefetchTask(QRunnable):
+    """
+    Fetch the info of one URL for MetadataPrefetcher
+    """
+    def __init__(self, prefetcher, key, url, skip_entry):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.key = key
+        self.url = url
+        self.skip_entry = skip_entry
+
+    def run(self):
+        try:
+            started = time.monotonic()
+            info, calls = fetch_info(self.url, self.prefetcher.cache, self.skip_entry)
+            if self.prefetcher.metrics is not None:
+                self.prefetcher.metrics.record_extraction(self.url, time.monotonic() - started,
+                                                          calls, cached=calls == 0)
+            self.prefetcher.fetched.emit(self.key, (info, calls), None)
+        except Exception as e:
+            self.prefetcher.fetched.emit(self.key, None, str(e))
+
+
+class MetadataPrefetcher(QObject):
+    """
+    Resolves the info of pasted/imported URLs in the background, at most
+    max_workers at a time, so the format dialog opens without waiting.
+    Every error pauses the whole pool with exponential backoff (base_delay
+    doubling up to max_delay) so a burst of requests does not trip YouTube's
+    rate limiting; a URL is given up after max_attempts. URLs are keyed by
+    key(), so the shapes of one video or playlist share a single fetch.
+    """
+    ready = Signal(str)                   # key
+    failed = Signal(str, str)             # key, error message
+    fetched = Signal(str, object, object)  # key, (info, calls) or None, error (from worker threads)
+
+    def __init__(self, cache=None, metrics=None, max_workers=2, max_attempts=3,
+                 base_delay=2.0, max_delay=60.0, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.metrics = metrics
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.queue = deque()   # (key, url, skip_entry) waiting for a worker
+        self.running = {}      # key -> (url, skip_entry)
+        self.results = {}      # key -> (info, extractor_calls)
+        self.errors = {}       # key -> error message
+        self.attempts = {}     # key -> failed attempts, for the keys not discarded
+        self.delay = 0.0
+        self.paused = False
+        # One timer, so a shorter backoff never ends the pause of a longer one
+        self.resume_timer = QTimer(self)
+        self.resume_timer.setSingleShot(True)
+        self.resume_timer.timeout.connect(self.resume)
+        self.fetched.connect(self.on_fetched)
+
+    @staticmethod
+    def key(url):
+        """
+        Canonical key of url (see cache.cache_key), else the URL itself;
+        a key is its own key
+        """
+        return cache_key(url) or url.strip()
+
+    def add(self, url, skip_entry=None):
+        key = self.key(url)
+        if key in self.running:
+            # Wanted again after a discard(): keep the result when it arrives
+            self.attempts.setdefault(key, 0)
+            return
+        if key in self.results or any(key == k for k, _, _ in self.queue):
+            return
+        self.errors.pop(key, None)
+        self.attempts[key] = 0
+        self.queue.append((key, url, skip_entry))
+        self.pump()
+
+    def discard(self, url):
+        """
+        Forget url: its result or error, and its fetch if it has not started
+        (the result of a running one is dropped when it arrives)
+        """
+        key = self.key(url)
+        self.queue = deque(item for item in self.queue if item[0] != key)
+        self.results.pop(key, None)
+        self.errors.pop(key, None)
+        self.attempts.pop(key, None)
+
+    def state(self, url):
+        key = self.key(url)
+        if key in self.results:
+            return 'ready'
+        if key in self.errors:
+            return 'failed'
+        return 'fetching'
+
+    def take(self, url):
+        """
+        The prefetched (info, extractor_calls) of url, or None; each result is handed out once
+        """
+        key = self.key(url)
+        self.attempts.pop(key, None)
+        return self.results.pop(key, None)
+
+    def pump(self):
+        while not self.paused and self.queue and len(self.running) < self.max_workers:
+            key, url, skip_entry = self.queue.popleft()
+            self.running[key] = (url, skip_entry)
+            self.pool.start(PrefetchTask(self, key, url, skip_entry))
+
+    def on_fetched(self, key, result, error):
+        url, skip_entry = self.running.pop(key)
+        if key not in self.attempts:
+            pass  # discarded while running
+        elif error is None:
+            self.results[key] = result
+            self.delay = 0.0
+            self.ready.emit(key)
+        else:
+            self.attempts[key] += 1
+            if self.attempts[key] < self.max_attempts:
+                self.queue.append((key, url, skip_entry))
+            else:
+                self.errors[key] = error
+                self.failed.emit(key, error)
+            self.delay = min(max(self.delay * 2, self.base_delay), self.max_delay)
+            self.paused = True
+            remaining = self.resume_timer.remainingTime() if self.resume_timer.isActive() else 0
+            self.resume_timer.start(max(remaining, int(self.delay * 1000)))
+        self.pump()
+
+    def resume(self):
+        self.paused = False
+        self.pump()
+
+
 class FormatSelectionDialog(QDialog):
     """
     Dialog window to select video quality and output format
@@ -112,6 +403,7 @@ class FormatSelectionDialog(QDialog):
         self.video_info = video_info
         self.selected_format = None
         self.selected_file_format = 'mp4'
+        self.merge_plan = None
         self.init_ui(thumbnail_pixmap)
 
     def init_ui(self, thumbnail_pixmap):
@@ -122,13 +414,12 @@ class FormatSelectionDialog(QDialog):
         layout.setSpacing(15)
         layout.setContentsMargins(20, 20, 20, 20)
 
-        # Thumbnail
-        thumbnail_label = QLabel()
-        if thumbnail_pixmap:
-            scaled_pixmap = thumbnail_pixmap.scaled(560, 315, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            thumbnail_label.setPixmap(scaled_pixmap)
-        thumbnail_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(thumbnail_label)
+        # Thumbnail (pre-scaled by ThumbnailLoader, may arrive later)
+        self.thumbnail_label = QLabel()
+        self.thumbnail_label.setMinimumHeight(THUMBNAIL_SIZES['dialog'][1])
+        self.set_thumbnail(thumbnail_pixmap)
+        self.thumbnail_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.thumbnail_label)
 
         # Video title
         title = self.video_info.get('title', 'Untitled')
@@ -149,6 +440,12 @@ class FormatSelectionDialog(QDialog):
         info_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(info_label)
 
+        # Audio only: a single audio stream instead of video + bestaudio
+        self.audio_only_check = QCheckBox("Audio only")
+        self.audio_only_check.setEnabled(bool(self.video_info.get('processed_audio')))
+        self.audio_only_check.toggled.connect(self.on_audio_only_toggled)
+        layout.addWidget(self.audio_only_check)
+
         # Quality selection
         quality_group = QGroupBox("Select Quality")
         quality_layout = QVBoxLayout()
@@ -157,9 +454,7 @@ class FormatSelectionDialog(QDialog):
         formats = self.video_info.get('processed_formats', [])
         if formats:
             for i, fmt in enumerate(formats):
-                quality = fmt['quality']
-                has_audio = " (with audio)" if fmt['has_audio'] else " (video only)"
-                radio = QRadioButton(f"{quality}{has_audio}")
+                radio = QRadioButton()
                 radio.setProperty('format_data', fmt)
                 self.quality_button_group.addButton(radio, i)
                 quality_layout.addWidget(radio)
@@ -170,23 +465,81 @@ class FormatSelectionDialog(QDialog):
 
         quality_group.setLayout(quality_layout)
         layout.addWidget(quality_group)
+        self.quality_group = quality_group
+
+        # Audio stream selection (audio only mode)
+        self.audio_group = QGroupBox("Select Audio")
+        audio_layout = QVBoxLayout()
+        self.audio_button_group = QButtonGroup()
+        for i, audio in enumerate(self.video_info.get('processed_audio') or []):
+            radio = QRadioButton()
+            radio.setProperty('audio_data', audio)
+            self.audio_button_group.addButton(radio, i)
+            audio_layout.addWidget(radio)
+            if i == 0:
+                radio.setChecked(True)
+        self.audio_group.setLayout(audio_layout)
+        self.audio_group.setVisible(False)
+        layout.addWidget(self.audio_group)
 
         # Output format selection
         format_group = QGroupBox("Output Format")
         format_layout = QHBoxLayout()
         self.format_combo = QComboBox()
-        self.format_combo.addItem("MP4 (H.264 - Best compatibility)", "mp4")
-        self.format_combo.addItem("MKV (Matroska - High quality)", "mkv")
-        self.format_combo.addItem("WEBM (VP9 - Web optimized)", "webm")
+        self.fill_format_combo(OUTPUT_FORMATS, supported_containers())
         self.format_combo.setMinimumHeight(35)
+        self.format_combo.currentIndexChanged.connect(self.update_quality_labels)
         format_layout.addWidget(self.format_combo)
         format_group.setLayout(format_layout)
         layout.addWidget(format_group)
+        self.update_quality_labels()
+
+        # Performance settings
+        performance = load_performance_settings()
+        perf_group = QGroupBox("Performance")
+        perf_layout = QHBoxLayout()
+        perf_layout.addWidget(QLabel("Parallel fragments:"))
+        self.fragments_spin = QSpinBox()
+        self.fragments_spin.setRange(1, 32)
+        self.fragments_spin.setValue(performance['concurrent_fragments'])
+        perf_layout.addWidget(self.fragments_spin)
+        perf_layout.addWidget(QLabel("Chunk size:"))
+        self.chunk_combo = QComboBox()
+        for label, size in HTTP_CHUNK_SIZES:
+            self.chunk_combo.addItem(label, size)
+        chunk_index = self.chunk_combo.findData(performance['http_chunk_size'])
+        self.chunk_combo.setCurrentIndex(max(chunk_index, 0))
+        perf_layout.addWidget(self.chunk_combo)
+        perf_layout.addWidget(QLabel("Downloader:"))
+        self.downloader_combo = QComboBox()
+        self.downloader_combo.addItem("Built-in", "")
+        for name in EXTERNAL_DOWNLOADER_ARGS:
+            if shutil.which(name):
+                self.downloader_combo.addItem(name, name)
+        self.downloader_combo.setCurrentIndex(max(self.downloader_combo.findData(performance['external_downloader']), 0))
+        perf_layout.addWidget(self.downloader_combo)
+        staging_layout = QHBoxLayout()
+        staging_layout.addWidget(QLabel("Staging folder:"))
+        self.staging_input = QLineEdit(performance['staging_dir'])
+        self.staging_input.setPlaceholderText(f"{STAGING_DIRNAME} in the save folder")
+        self.staging_input.setToolTip("Temporary files of downloads. Must be on the same disk as the "
+                                      "save folder, so finished files are moved without copying.")
+        staging_layout.addWidget(self.staging_input)
+        staging_btn = QPushButton("Browse...")
+        staging_btn.clicked.connect(self.browse_staging)
+        staging_layout.addWidget(staging_btn)
+        perf_rows = QVBoxLayout()
+        perf_rows.addLayout(perf_layout)
+        perf_rows.addLayout(staging_layout)
+        perf_group.setLayout(perf_rows)
+        layout.addWidget(perf_group)
 
         # FFmpeg status
         status_label = QLabel()
-        if self.check_ffmpeg():
+        capabilities = ffmpeg_probe.probe()
+        if capabilities['ffmpeg']:
             status_label.setText("✓ FFmpeg detected - Video/audio merging available")
+            status_label.setToolTip(f"{capabilities['ffmpeg']}\n{capabilities['version']}")
             status_label.setStyleSheet("color: #2ecc71; font-weight: bold;")
         else:
             status_label.setText("⚠ FFmpeg not found - May have issues merging video and audio")
@@ -216,28 +569,100 @@ class FormatSelectionDialog(QDialog):
         btn_layout.addWidget(download_btn)
         layout.addLayout(btn_layout)
 
-    def check_ffmpeg(self):
-        try:
-            result = subprocess.run(['ffmpeg', '-version'], capture_output=True, timeout=5)
-            return result.returncode == 0
-        except Exception:
-            return shutil.which('ffmpeg') is not None
+    def fill_format_combo(self, output_formats, containers):
+        self.format_combo.blockSignals(True)
+        self.format_combo.clear()
+        for label, container in output_formats:
+            if container in containers:
+                self.format_combo.addItem(label, container)
+        self.format_combo.blockSignals(False)
+
+    def on_audio_only_toggled(self, audio_only):
+        self.quality_group.setVisible(not audio_only)
+        self.audio_group.setVisible(audio_only)
+        if audio_only:
+            self.fill_format_combo(AUDIO_OUTPUT_FORMATS, supported_containers(AUDIO_CONTAINER_MUXERS))
+        else:
+            self.fill_format_combo(OUTPUT_FORMATS, supported_containers())
+        self.update_quality_labels()
+
+    def update_quality_labels(self):
+        """
+        Describe each quality by the streams planned for the chosen container
+        """
+        container = self.format_combo.currentData()
+        audio_formats = self.video_info.get('processed_audio')
+        for radio in self.quality_button_group.buttons():
+            fmt = radio.property('format_data')
+            plan = plan_merge(fmt, audio_formats, container)
+            stream = plan['video']
+            has_audio = " (with audio)" if stream['has_audio'] else " (video only)"
+            size = f" - ~{format_bytes(plan['size'])}" if plan['size'] else ""
+            codec = f", {stream['vcodec'].split('.')[0]}" if stream.get('vcodec') else ""
+            if plan['audio']:
+                codec += f"+{plan['audio']['acodec'].split('.')[0]}"
+            if plan['transcode']:
+                codec += ", needs re-encoding"
+            radio.setText(f"{fmt['quality']}{has_audio}{size}{codec}")
+        for radio in self.audio_button_group.buttons():
+            audio = radio.property('audio_data')
+            plan = plan_audio([audio], container, audio)
+            bitrate = f"{audio['abr']:.0f} kbps" if audio['abr'] else "N/A kbps"
+            size = f" - ~{format_bytes(audio['size'])}" if audio['size'] else ""
+            copy = ", needs re-encoding" if plan['transcode'] else ""
+            radio.setText(f"{bitrate}, {audio['acodec'].split('.')[0]} ({audio['ext']}){size}{copy}")
+
+    def set_thumbnail(self, pixmap):
+        if pixmap:
+            self.thumbnail_label.setPixmap(pixmap)
 
     def on_download(self):
-        checked_button = self.quality_button_group.checkedButton()
+        audio_only = self.audio_only_check.isChecked()
+        checked_button = (self.audio_button_group if audio_only else self.quality_button_group).checkedButton()
         if checked_button:
-            fmt = checked_button.property('format_data')
+            container = self.format_combo.currentData()
+            if audio_only:
+                fmt = checked_button.property('audio_data')
+                plan = plan_audio(self.video_info['processed_audio'], container, fmt)
+            else:
+                fmt = checked_button.property('format_data')
+                plan = plan_merge(fmt, self.video_info.get('processed_audio'), container)
+            if plan['transcode']:
+                reasons = "\n".join(f"- {reason}" for reason in plan['transcode'])
+                ret = QMessageBox.question(self, "Re-encoding needed",
+                                           f"These streams cannot be copied into {container.upper()}:\n{reasons}\n\n"
+                                           "Re-encoding is much slower than a copy"
+                                           f"{'' if audio_only else ' (MKV takes any stream)'}. "
+                                           "Continue anyway?")
+                if ret != QMessageBox.Yes:
+                    return
             self.selected_format = fmt
-            self.selected_file_format = self.format_combo.currentData()
+            self.selected_file_format = container
+            self.merge_plan = plan
+            save_performance_settings(self.get_performance_settings())
             self.accept()
         else:
             QMessageBox.warning(self, "Error", "Please select a quality option!")
 
+    def browse_staging(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select staging folder")
+        if folder:
+            self.staging_input.setText(folder)
+
+    def get_performance_settings(self):
+        return {
+            'concurrent_fragments': self.fragments_spin.value(),
+            'http_chunk_size': self.chunk_combo.currentData(),
+            'external_downloader': self.downloader_combo.currentData(),
+            'staging_dir': self.staging_input.text().strip(),
+        }
+
     def get_selection(self):
         if self.selected_format:
-            return (self.selected_format['format_id'],
+            stream = self.merge_plan['video'] or self.merge_plan['audio']
+            return (stream['format_id'],
                     self.selected_file_format,
-                    self.selected_format['has_audio'])
+                    stream.get('has_audio', True))
         return None
 
 
@@ -245,71 +670,470 @@ class FormatSelectionDialog(QDialog):
 class DownloadThread(QThread):
     """
     Thread to download video/playlist without freezing UI
+    (runs a core.Downloader, see there for the arguments); the job's
+    timings are recorded to metrics (a MetricsSink) when it ends.
+    Progress and outcome are plain attributes that the GUI thread polls
+    (see DownloadQueue.refresh) instead of a signal per progress event;
+    QThread.finished tells it when success and result are set.
     """
-    progress = Signal(int, str)
-    finished = Signal(bool, str)
-
-    def __init__(self, url, format_id, output_path, output_format, has_audio, is_playlist=False):
+    def __init__(self, url, format_id, output_path, output_format, has_audio, is_playlist=False,
+                 info=None, extractor_calls=0, extra_info=None, performance=None, archive=None,
+                 merge_plan=None, metrics=None):
         super().__init__()
         self.url = url
+        self.metrics = metrics
+        self.downloader = Downloader(url, format_id, output_path, output_format, has_audio,
+                                     is_playlist=is_playlist, info=info,
+                                     extractor_calls=extractor_calls, extra_info=extra_info,
+                                     performance=performance, archive=archive, merge_plan=merge_plan,
+                                     on_progress=self.set_progress, on_stage=self.set_stage)
+        self.progress = None  # (percent, message) last reported
+        self.stage = None  # 'running' or 'merging'
+        self.success = None  # True or False once run() is done
+        self.result = ""  # message for the outcome
+        self.retryable = True  # False if the job failed in a way retrying does not fix
+
+    def set_progress(self, percent, message):
+        self.progress = (percent, message)
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def run(self):
+        try:
+            self.downloader.run()
+            self.result = "Download completed successfully!"
+            self.success = True
+        except Exception as e:
+            self.retryable = not isinstance(e, NotEnoughSpace)
+            self.result = f"Error: {download_error_message(e)}"
+            self.success = False
+        if self.metrics is not None:
+            self.metrics.record_job(self.downloader.metrics)
+
+
+
+class DownloadJob:
+    """
+    A single queued download and its current state.
+    A playlist job is not run itself: it groups one child job per entry.
+    """
+    QUEUED, RUNNING, MERGING, DONE, FAILED = 'queued', 'running', 'merging', 'done', 'failed'
+
+    def __init__(self, url, title, format_id, output_path, output_format, has_audio,
+                 is_playlist=False, info=None, extractor_calls=0, extra_info=None, parent=None,
+                 performance=None, video_id=None, merge_plan=None):
+        self.url = url
+        self.title = title
         self.format_id = format_id
         self.output_path = output_path
         self.output_format = output_format
         self.has_audio = has_audio
         self.is_playlist = is_playlist
+        self.info = info
+        self.extractor_calls = extractor_calls
+        self.extra_info = extra_info
+        self.performance = performance
+        self.video_id = video_id
+        self.merge_plan = merge_plan
+        self.postprocess_seconds = None
+        self.journal_id = None
+        self.parent = parent
+        self.children = []
+        self.attempts = 0
+        self.state = DownloadJob.QUEUED
+        self.percent = 0
+        self.message = ""
+
+    def journal_fields(self):
+        """
+        What it takes to run the job again after a restart (see JobJournal)
+        """
+        return {
+            'url': self.url,
+            'title': self.title,
+            'format_id': self.format_id,
+            'output_path': self.output_path,
+            'output_format': self.output_format,
+            'has_audio': self.has_audio,
+            'is_playlist': self.is_playlist,
+            'extra_info': self.extra_info,
+            'performance': self.performance,
+            'video_id': self.video_id,
+            'merge_plan': self.merge_plan,
+        }
+
+    def key(self):
+        """
+        Identity of the work: the same video or playlist (in any URL shape)
+        into the same folder and container
+        """
+        return cache_key(self.url) or self.url, normalize_dir(self.output_path), self.output_format
+
+    def is_active(self):
+        return self.state in (DownloadJob.RUNNING, DownloadJob.MERGING)
+
+    def is_finished(self):
+        return self.state in (DownloadJob.DONE, DownloadJob.FAILED)
+
+    def update_from_children(self):
+        """
+        Derive the state and overall progress of a playlist job from its entries
+        """
+        children = self.children
+        done = sum(1 for c in children if c.state == DownloadJob.DONE)
+        failed = sum(1 for c in children if c.state == DownloadJob.FAILED)
+        self.percent = sum(100 if c.is_finished() else c.percent for c in children) // max(len(children), 1)
+        if done + failed == len(children):
+            self.state = DownloadJob.FAILED if failed else DownloadJob.DONE
+        elif any(c.is_active() for c in children):
+            self.state = DownloadJob.RUNNING
+        else:
+            self.state = DownloadJob.QUEUED
+        self.message = f"{done}/{len(children)} entries done" + (f", {failed} failed" if failed else "")
 
-    def run(self):
-        try:
-            def progress_hook(d):
-                status = d.get('status')
-                if status == 'downloading':
-                    downloaded = d.get('downloaded_bytes', 0)
-                    total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-                    if total > 0:
-                        percent = int((downloaded / total) * 100)
-                        speed = d.get('_speed_str') or d.get('speed') or 'N/A'
-                        self.progress.emit(percent, f"Downloading: {speed}")
-                elif status == 'finished':
-                    self.progress.emit(95, "Processing and merging...")
-
-            if self.has_audio:
-                fmt = self.format_id
-            else:
-                fmt = f"{self.format_id}+bestaudio/best"
-
-            outtmpl = os.path.join(self.output_path, '%(title)s.%(ext)s')
-            if self.is_playlist:
-                outtmpl = os.path.join(self.output_path, '%(playlist_index)s - %(title)s.%(ext)s')
-
-            ydl_opts = {
-                'format': fmt,
-                'outtmpl': outtmpl,
-                'merge_output_format': self.output_format,
-                'progress_hooks': [progress_hook],
-                'quiet': True,
-                'no_warnings': True,
-                'continuedl': True,
-                'retries': 10,
-                'fragment_retries': 10,
-            }
 
-            # Fallback if FFmpeg missing
-            if not shutil.which('ffmpeg'):
-                self.progress.emit(0, "Warning: FFmpeg not found, using best single-format...")
-                ydl_opts['format'] = 'best'
+class JobTableModel(QAbstractTableModel):
+    """
+    Table model exposing the download queue (one row per job)
+    """
+    COLUMNS = ["Title", "State", "Progress", "Status"]
+    TITLE, STATE, PROGRESS, STATUS = range(4)
+    BAR_SIZE = (132, 20)  # progress bar drawn in the progress column
+
+    def __init__(self, thumbnails=None, parent=None):
+        super().__init__(parent)
+        self.jobs = []
+        self.thumbnails = thumbnails
+        self.bars = {}  # percent -> QPixmap of the progress bar
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-                if info.get('_type') == 'playlist' and info.get('entries'):
-                    info['entries'] = [e for e in info['entries'] if isinstance(e, dict)]
-                ydl.download([self.url])
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.jobs)
 
-            self.finished.emit(True, "Download completed successfully!")
-        except Exception as e:
-            msg = str(e)
-            if 'ffmpeg' in msg.lower():
-                msg += "\n\nFFmpeg is required for merging video/audio. Install FFmpeg:\nWindows: ffmpeg.org\nLinux: sudo apt install ffmpeg\nMac: brew install ffmpeg"
-            self.finished.emit(False, f"Error: {msg}")
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        job = self.jobs[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == self.TITLE:
+                return job.title
+            if column == self.STATE:
+                return job.state.capitalize()
+            if column == self.STATUS:
+                return job.message
+        elif role == Qt.DecorationRole:
+            if column == self.PROGRESS:
+                return self.progress_bar(job.percent)
+            if column == self.TITLE and job.video_id and self.thumbnails is not None:
+                pixmap = self.thumbnails.pixmap(job.video_id, 'row')
+                if pixmap is None:
+                    self.thumbnails.request(job.video_id)
+                return pixmap
+        elif role == Qt.ToolTipRole:
+            if column == self.TITLE:
+                return job.url
+            if column == self.STATUS:
+                return job.message
+        return None
+
+    def progress_bar(self, percent):
+        """
+        The progress column as a pixmap, drawn once per percent value:
+        the view paints it itself, with no Python delegate per repaint
+        """
+        pixmap = self.bars.get(percent)
+        if pixmap is None:
+            pixmap = QPixmap(*self.BAR_SIZE)
+            pixmap.fill(Qt.transparent)
+            bar = QStyleOptionProgressBar()
+            bar.rect = pixmap.rect()
+            bar.minimum = 0
+            bar.maximum = 100
+            bar.progress = percent
+            bar.text = f"{percent}%"
+            bar.textVisible = True
+            bar.textAlignment = Qt.AlignCenter
+            painter = QPainter(pixmap)
+            QApplication.style().drawControl(QStyle.CE_ProgressBar, bar, painter)
+            painter.end()
+            self.bars[percent] = pixmap
+        return pixmap
+
+    def add_jobs(self, jobs):
+        # Rows change in place without dataChanged: the view repaints on
+        # the queue's refresh timer (see DownloadQueue)
+        row = len(self.jobs)
+        self.beginInsertRows(QModelIndex(), row, row + len(jobs) - 1)
+        self.jobs.extend(jobs)
+        self.endInsertRows()
+
+    def remove_finished(self):
+        self.beginResetModel()
+        self.jobs = [job for job in self.jobs
+                     if not (job.parent or job).is_finished()]
+        self.endResetModel()
+
+
+# How often the queue copies progress from its threads (and the view repaints)
+QUEUE_REFRESH_MS = 500
+
+
+class DownloadQueue(QObject):
+    """
+    Runs queued jobs on a bounded pool of DownloadThread workers.
+    Playlists are fanned out into one job per entry; failed jobs are
+    retried on their own up to max_attempts times. A job for work already
+    in the queue (see DownloadJob.key) is merged into the queued one, and
+    jobs for the same video never run at the same time. With a journal
+    (journal.JobJournal) every job is written ahead of running it and its
+    state changes are recorded, so restore() can resume the queue.
+    Progress is picked up by refresh() on refresh_timer rather than per
+    event; listeners connect to the same timer and collect the finished
+    top-level jobs with take_finished().
+    """
+    def __init__(self, max_workers=4, max_attempts=3, thumbnails=None, archive=None, journal=None,
+                 metrics=None, parent=None):
+        super().__init__(parent)
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.archive = archive
+        self.journal = journal
+        self.metrics = metrics
+        self.model = JobTableModel(thumbnails, self)
+        self.threads = {}  # job -> running DownloadThread
+        self.finished_jobs = []  # (top-level job, success, message) not taken yet
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(QUEUE_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+
+    def find_unfinished(self, key):
+        for job in self.model.jobs:
+            if job.parent is None and not job.is_finished() and job.key() == key:
+                return job
+        return None
+
+    def add_job(self, job):
+        """
+        Queue job; returns it, or the unfinished job already doing the same work
+        """
+        existing = self.find_unfinished(job.key())
+        if existing is not None:
+            return existing
+        if self.journal is not None:
+            job.journal_id, _ = self.journal.add(job.journal_fields(), job.state)
+        self.model.add_jobs([job])
+        self.schedule()
+        return job
+
+    def add_playlist(self, job):
+        """
+        Queue a playlist job as one child job per resolved entry
+        (entries already in the download archive are marked done right away);
+        returns it, or the unfinished job already doing the same work
+        """
+        existing = self.find_unfinished(job.key())
+        if existing is not None:
+            return existing
+        info = job.info
+        output_index = self.archive.index(job.output_path) if self.archive is not None else None
+        playlist_fields = playlist_extra_info(info, None)  # the same for every entry
+        for index, entry in playlist_entries(info):
+            url = entry.get('webpage_url') or entry.get('url') or entry.get('id')
+            title = entry.get('title') or url
+            # Apart from the entry resolved for the format dialog, children
+            # get compact stubs, resolved in a pooled session when downloading
+            child = DownloadJob(url, f"{index} - {title}", job.format_id, job.output_path,
+                                job.output_format, job.has_audio, info=entry,
+                                extra_info={**playlist_fields, 'playlist_index': index}, parent=job,
+                                performance=job.performance, video_id=entry.get('id'),
+                                merge_plan=job.merge_plan)
+            if output_index is not None and output_index.is_complete_entry(entry):
+                child.state = DownloadJob.DONE
+                child.percent = 100
+                child.message = "Already downloaded"
+                child.info = None
+            job.children.append(child)
+        job.info = None
+        job.update_from_children()
+        if self.journal is not None:
+            job.journal_id, child_ids = self.journal.add(
+                job.journal_fields(), job.state,
+                [(child.journal_fields(), child.state) for child in job.children])
+            for child, child_id in zip(job.children, child_ids):
+                child.journal_id = child_id
+        self.model.add_jobs([job, *job.children])
+        self.schedule()
+
+    def restore(self, records):
+        """
+        Re-queue the jobs of a journal (JobJournal.pending()) after a
+        restart. Entries that finished stay done; interrupted ones start
+        again and pick up their .part files. Returns the number of jobs
+        with work left.
+        """
+        resumed = 0
+        jobs = []
+        for record in records:
+            job = self.restored_job(record)
+            for child_record in record['children']:
+                job.children.append(self.restored_job(child_record, parent=job))
+            if job.children:
+                job.update_from_children()
+            if not job.is_finished():
+                resumed += 1
+            jobs += [job, *job.children]
+        if jobs:
+            self.model.add_jobs(jobs)
+        self.schedule()
+        return resumed
+
+    def restored_job(self, record, parent=None):
+        job = DownloadJob(record['url'], record['title'], record['format_id'], record['output_path'],
+                          record['output_format'], record['has_audio'],
+                          is_playlist=record['is_playlist'], extra_info=record['extra_info'],
+                          parent=parent, performance=record['performance'],
+                          video_id=record['video_id'], merge_plan=record['merge_plan'])
+        job.journal_id = record['id']
+        if record['state'] == DownloadJob.DONE:
+            job.state = DownloadJob.DONE
+            job.percent = 100
+            job.message = "Finished before restart"
+        elif record['state'] == DownloadJob.FAILED:
+            job.state = DownloadJob.FAILED
+            job.message = "Failed before restart"
+        else:
+            job.message = "Resumed after restart"
+        return job
+
+    def journal_state(self, job):
+        if self.journal is not None and job.journal_id is not None:
+            self.journal.set_state(job.journal_id, job.state)
+
+    def retry_failed(self):
+        for job in self.model.jobs:
+            if job.state == DownloadJob.FAILED and not job.children:
+                job.attempts = 0
+                job.state = DownloadJob.QUEUED
+                job.message = "Queued for retry"
+                self.journal_state(job)
+                self.job_updated(job)
+        self.schedule()
+
+    def set_max_workers(self, count):
+        self.max_workers = max(1, count)
+        self.schedule()
+
+    def clear_finished(self):
+        if self.journal is not None:
+            for job in self.model.jobs:
+                if job.parent is None and job.is_finished() and job.journal_id is not None:
+                    self.journal.remove(job.journal_id)
+        self.model.remove_finished()
+
+    def active_count(self):
+        return len(self.threads)
+
+    def overall_percent(self):
+        jobs = [job for job in self.model.jobs if job.parent is None]
+        if not jobs:
+            return 0
+        return sum(100 if job.is_finished() else job.percent for job in jobs) // len(jobs)
+
+    def schedule(self):
+        # The same video from two playlists waits for the running copy
+        # (and is then skipped through the download archive)
+        running = {job.key() for job in self.threads}
+        for job in self.model.jobs:
+            if self.active_count() >= self.max_workers:
+                break
+            if job.state == DownloadJob.QUEUED and not job.children and job.key() not in running:
+                running.add(job.key())
+                self.start_job(job)
+
+    def start_job(self, job):
+        thread = DownloadThread(job.url, job.format_id, job.output_path, job.output_format,
+                                job.has_audio, is_playlist=job.is_playlist, info=job.info,
+                                extractor_calls=job.extractor_calls, extra_info=job.extra_info,
+                                performance=job.performance, archive=self.archive,
+                                merge_plan=job.merge_plan, metrics=self.metrics)
+        thread.finished.connect(lambda: self.on_finished(job))
+        self.threads[job] = thread
+        job.attempts += 1
+        job.state = DownloadJob.RUNNING
+        job.message = "Starting download..."
+        self.journal_state(job)
+        self.job_updated(job)
+        thread.start()
+
+    def job_updated(self, job):
+        if job.parent is not None:
+            job.parent.update_from_children()
+
+    def refresh(self):
+        """
+        Copy what the running threads reported since the last tick into
+        their jobs, and update the playlists they belong to
+        """
+        parents = set()
+        for job, thread in self.threads.items():
+            if thread.progress is not None:
+                job.percent, job.message = thread.progress
+            if thread.stage is not None:
+                job.state = thread.stage
+            if job.parent is not None:
+                parents.add(job.parent)
+        for parent in parents:
+            parent.update_from_children()
+
+    def take_finished(self):
+        finished, self.finished_jobs = self.finished_jobs, []
+        return finished
+
+    def on_finished(self, job):
+        thread = self.threads.pop(job)
+        thread.wait()
+        thread.deleteLater()
+        job.postprocess_seconds = thread.downloader.postprocess_seconds
+        success, message, retryable = thread.success, thread.result, thread.retryable
+        if not success and retryable and job.attempts < self.max_attempts:
+            # Retry on its own; drop the info so the entry is extracted afresh
+            job.state = DownloadJob.QUEUED
+            job.percent = 0
+            job.message = f"Retrying ({job.attempts}/{self.max_attempts - 1}): {message}"
+            job.info = None
+            self.job_updated(job)
+            self.schedule()
+            return
+        if success and job.postprocess_seconds:
+            message = f"{message} (post-processing {job.postprocess_seconds:.1f}s)"
+        job.state = DownloadJob.DONE if success else DownloadJob.FAILED
+        job.percent = 100 if success else job.percent
+        job.message = message
+        job.info = None  # release the (possibly large) info dict
+        self.journal_state(job)
+        self.job_updated(job)
+        parent = job.parent
+        finished = job if parent is None else parent
+        if finished.is_finished():
+            # Done jobs need no resuming; failed ones stay journaled until cleared
+            if finished.state == DownloadJob.DONE and self.journal is not None and finished.journal_id is not None:
+                self.journal.remove(finished.journal_id)
+                finished.journal_id = None
+                for child in finished.children:
+                    child.journal_id = None
+            self.finished_jobs.append((finished, finished.state == DownloadJob.DONE,
+                                       message if parent is None else parent.message))
+        self.schedule()
 
 
 
@@ -317,16 +1141,28 @@ class YouTubeDownloader(QMainWindow):
     def __init__(self):
         super().__init__()
         self.dark_mode = True
-        self.network_manager = QNetworkAccessManager()
+        self.thumbnail_loader = ThumbnailLoader(parent=self)
         self.current_video_info = None
-        self.current_thumbnail = None
+        self.metadata_cache = MetadataCache()
+        self.download_archive = DownloadArchive()
+        self.job_journal = JobJournal()
+        self.metrics = MetricsSink()
+        self.sync_state = SyncState()
+        self.prefetcher = MetadataPrefetcher(cache=self.metadata_cache, metrics=self.metrics, parent=self)
+        self.prefetcher.ready.connect(self.on_prefetched)
+        self.prefetcher.failed.connect(self.on_prefetch_failed)
+        self.prefetch_paths = {}  # prefetcher key -> save folder its entries were checked against
+        self.typed_url = None  # URL in the input field, prefetched while it stays there
+        self.download_queue = DownloadQueue(max_workers=4, thumbnails=self.thumbnail_loader,
+                                            archive=self.download_archive, journal=self.job_journal,
+                                            metrics=self.metrics, parent=self)
+        self.download_queue.refresh_timer.timeout.connect(self.on_queue_refreshed)
         self.init_ui()
-        self.download_thread = None
         self.info_thread = None
 
     def init_ui(self):
         self.setWindowTitle("YouTube Downloader")
-        self.setMinimumSize(700, 400)
+        self.setMinimumSize(800, 600)
 
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -356,7 +1192,21 @@ class YouTubeDownloader(QMainWindow):
         self.url_input = QLineEdit()
         self.url_input.setPlaceholderText("Paste YouTube video or playlist link here...")
         self.url_input.setMinimumHeight(40)
-        url_layout.addWidget(self.url_input)
+        self.url_input.textChanged.connect(self.on_url_text_changed)
+        url_row = QHBoxLayout()
+        url_row.addWidget(self.url_input)
+        import_btn = QPushButton("Import URLs...")
+        import_btn.setMinimumHeight(40)
+        import_btn.clicked.connect(self.import_urls)
+        url_row.addWidget(import_btn)
+        url_layout.addLayout(url_row)
+        self.sync_check = QCheckBox("Only new videos of playlists/channels since the last sync")
+        url_layout.addWidget(self.sync_check)
+        # Pasted/imported URLs, fetched in the background until downloaded
+        self.pending_list = QListWidget()
+        self.pending_list.setMaximumHeight(120)
+        self.pending_list.setVisible(False)
+        url_layout.addWidget(self.pending_list)
         url_group.setLayout(url_layout)
         main_layout.addWidget(url_group)
 
@@ -382,6 +1232,42 @@ class YouTubeDownloader(QMainWindow):
         self.download_btn.clicked.connect(self.start_process)
         main_layout.addWidget(self.download_btn)
 
+        queue_group = QGroupBox("Download Queue")
+        queue_layout = QVBoxLayout()
+        queue_controls = QHBoxLayout()
+        queue_controls.addWidget(QLabel("Parallel downloads:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 16)
+        self.workers_spin.setValue(self.download_queue.max_workers)
+        self.workers_spin.valueChanged.connect(self.download_queue.set_max_workers)
+        queue_controls.addWidget(self.workers_spin)
+        queue_controls.addStretch()
+        retry_btn = QPushButton("Retry failed")
+        retry_btn.clicked.connect(self.download_queue.retry_failed)
+        queue_controls.addWidget(retry_btn)
+        clear_btn = QPushButton("Clear finished")
+        clear_btn.clicked.connect(self.download_queue.clear_finished)
+        queue_controls.addWidget(clear_btn)
+        queue_layout.addLayout(queue_controls)
+
+        self.queue_view = QTableView()
+        self.queue_view.setModel(self.download_queue.model)
+        # A C++ slot, so repainting runs no Python beyond the model's data()
+        self.download_queue.refresh_timer.timeout.connect(self.queue_view.viewport().update)
+        self.queue_view.verticalHeader().setVisible(False)
+        self.queue_view.setSelectionBehavior(QTableView.SelectRows)
+        row_width, row_height = THUMBNAIL_SIZES['row']
+        self.queue_view.setIconSize(QSize(row_width, row_height))
+        self.queue_view.verticalHeader().setDefaultSectionSize(row_height + 6)
+        header = self.queue_view.horizontalHeader()
+        header.setSectionResizeMode(JobTableModel.TITLE, QHeaderView.Stretch)
+        header.setSectionResizeMode(JobTableModel.STATE, QHeaderView.ResizeToContents)
+        header.resizeSection(JobTableModel.PROGRESS, 140)
+        header.setSectionResizeMode(JobTableModel.STATUS, QHeaderView.Stretch)
+        queue_layout.addWidget(self.queue_view)
+        queue_group.setLayout(queue_layout)
+        main_layout.addWidget(queue_group, 1)
+
         self.progress_bar = QProgressBar()
         self.progress_bar.setMinimumHeight(25)
         self.progress_bar.setTextVisible(True)
@@ -443,29 +1329,32 @@ class YouTubeDownloader(QMainWindow):
     # Video ID / thumbnail
     # -------------------------
     def extract_video_id(self, url):
-        parsed_url = urlparse(url)
-        if 'youtube.com' in parsed_url.netloc:
-            query_params = parse_qs(parsed_url.query)
-            return query_params.get('v', [None])[0]
-        elif 'youtu.be' in parsed_url.netloc:
-            return parsed_url.path[1:]
-        return None
+        return url_video_id(url)
 
     def load_thumbnail(self, video_id):
         if not video_id:
             return
-        thumbnail_url = f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
-        request = QNetworkRequest(thumbnail_url)
-        reply = self.network_manager.get(request)
-        reply.finished.connect(lambda: self.on_thumbnail_loaded(reply))
-
-    def on_thumbnail_loaded(self, reply):
-        if reply.error() == QNetworkReply.NoError:
-            data = reply.readAll()
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-            self.current_thumbnail = pixmap
-        reply.deleteLater()
+        self.thumbnail_loader.request(video_id)
+
+    def show_format_dialog(self, info):
+        """
+        Run FormatSelectionDialog for info; the thumbnail is filled in as
+        soon as it is loaded if it is not cached yet
+        """
+        video_id = info.get('id')
+        self.thumbnail_loader.request(video_id, notify=True)
+        dialog = FormatSelectionDialog(info, self.thumbnail_loader.pixmap(video_id, 'dialog'), self)
+
+        def on_thumbnail_ready(ready_id):
+            if ready_id == video_id:
+                dialog.set_thumbnail(self.thumbnail_loader.pixmap(video_id, 'dialog'))
+
+        self.thumbnail_loader.thumbnail_ready.connect(on_thumbnail_ready)
+        try:
+            accepted = dialog.exec() == QDialog.Accepted
+        finally:
+            self.thumbnail_loader.thumbnail_ready.disconnect(on_thumbnail_ready)
+        return dialog if accepted else None
 
     # -------------------------
     # Browse folder
@@ -475,11 +1364,109 @@ class YouTubeDownloader(QMainWindow):
         if folder:
             self.path_input.setText(folder)
 
+    # -------------------------
+    # Background prefetch
+    # -------------------------
+    def on_url_text_changed(self, text):
+        urls = [u for u in text.split() if '://' in u or cache_key(u)]
+        typed = None
+        if len(urls) > 1:
+            # A pasted batch goes to the pending list
+            for url in urls:
+                self.add_pending(url)
+            self.url_input.clear()
+        elif len(urls) == 1 and canonicalize(urls[0]):
+            typed = urls[0]
+        # Only the URL now in the field stays prefetched, not each edit of it
+        previous, self.typed_url = self.typed_url, typed
+        if (previous and self.pending_item(previous) is None
+                and (typed is None or self.prefetcher.key(previous) != self.prefetcher.key(typed))):
+            self.prefetcher.discard(previous)
+            self.prefetch_paths.pop(self.prefetcher.key(previous), None)
+        if typed:
+            self.prefetch(typed)
+
+    def import_urls(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import URLs", "", "Text files (*.txt);;All files (*)")
+        if not path:
+            return
+        try:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                urls = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to read {path}:\n{e}")
+            return
+        for url in urls:
+            self.add_pending(url)
+        self.status_label.setText(f"Imported {len(urls)} URL(s)")
+
+    def prefetch(self, url):
+        output_path = self.path_input.text().strip()
+        self.prefetch_paths[self.prefetcher.key(url)] = output_path
+        self.prefetcher.add(url, self.download_archive.index(output_path).is_complete_entry
+                            if output_path else None)
+
+    def pending_item(self, url):
+        """
+        Pending list item of url, or of any URL with the same prefetcher key
+        """
+        key = self.prefetcher.key(url)
+        for row in range(self.pending_list.count()):
+            item = self.pending_list.item(row)
+            if item.data(Qt.UserRole + 1) == key:
+                return item
+        return None
+
+    def add_pending(self, url):
+        if self.pending_item(url) is not None:
+            return
+        item = QListWidgetItem(f"⏳ {url}")
+        item.setData(Qt.UserRole, url)
+        item.setData(Qt.UserRole + 1, self.prefetcher.key(url))
+        self.pending_list.addItem(item)
+        self.pending_list.setVisible(True)
+        self.prefetch(url)
+
+    def remove_pending(self, url):
+        item = self.pending_item(url)
+        if item is not None:
+            self.pending_list.takeItem(self.pending_list.row(item))
+        self.pending_list.setVisible(self.pending_list.count() > 0)
+
+    def on_prefetched(self, key):
+        info, _ = self.prefetcher.results[key]
+        entries = info.get('entries') or []
+        preview = next((e for e in entries if isinstance(e, dict)), None) if entries else info
+        if preview and preview.get('id'):
+            self.load_thumbnail(preview['id'])
+        item = self.pending_item(key)
+        if item is None:
+            return
+        url = item.data(Qt.UserRole)
+        if entries:
+            text = f"✓ {info.get('title') or url} — {len(entries)} videos"
+        else:
+            duration = int(info.get('duration') or 0)
+            text = f"✓ {info.get('title') or url} — {f'{duration // 60}:{duration % 60:02d}' if duration else 'N/A'}"
+            formats = info.get('processed_formats') or []
+            if formats and formats[0].get('size'):
+                text += f" — ~{format_bytes(formats[0]['size'])}"
+        item.setText(text)
+
+    def on_prefetch_failed(self, key, error):
+        item = self.pending_item(key)
+        if item is not None:
+            item.setText(f"✗ {item.data(Qt.UserRole)}")
+            item.setToolTip(error)
+
     # -------------------------
     # Start process
     # -------------------------
     def start_process(self):
         url = self.url_input.text().strip()
+        if not url and self.pending_list.count():
+            item = self.pending_list.currentItem() or self.pending_list.item(0)
+            url = item.data(Qt.UserRole)
         if not url:
             QMessageBox.warning(self, "Error", "Please enter a video or playlist URL!")
             return
@@ -488,15 +1475,33 @@ class YouTubeDownloader(QMainWindow):
             QMessageBox.warning(self, "Error", "Please select a save folder!")
             return
 
+        # Skip finished work before any extraction
+        output_index = self.download_archive.index(output_path)
+        key = cache_key(url)
+        if key and key.startswith('video:') and output_index.is_complete('Youtube', key[6:]):
+            done = output_index.get('Youtube', key[6:])
+            ret = QMessageBox.question(self, "Already downloaded",
+                                       f"This video is already downloaded:\n{done['path']}\n\nDownload it again?")
+            if ret != QMessageBox.Yes:
+                return
+            self.download_archive.forget('Youtube', key[6:], output_path)
+
         self.status_label.setText("Fetching video information...")
         self.download_btn.setEnabled(False)
-        self.progress_bar.setValue(0)
 
         video_id = self.extract_video_id(url)
         if video_id:
             self.load_thumbnail(video_id)
 
-        self.info_thread = VideoInfoThread(url)
+        # Use the background fetch if it checked the same save folder
+        syncing = self.sync_check.isChecked()
+        prefetched = None
+        if self.prefetch_paths.get(self.prefetcher.key(url)) == output_path and not syncing:
+            prefetched = self.prefetcher.take(url)
+        self.info_thread = VideoInfoThread(url, cache=self.metadata_cache,
+                                           skip_entry=output_index.is_complete_entry,
+                                           metrics=self.metrics, prefetched=prefetched,
+                                           sync_state=self.sync_state if syncing else None)
         self.info_thread.info_ready.connect(self.on_info_ready)
         self.info_thread.error.connect(self.on_info_error)
         self.info_thread.start()
@@ -505,11 +1510,22 @@ class YouTubeDownloader(QMainWindow):
         self.current_video_info = info
         is_playlist = info.get('_type') == 'playlist' or bool(info.get('entries'))
 
+        if 'sync_key' in info and not info.get('entries'):
+            QMessageBox.information(self, "Up to date",
+                                    f"No new videos in {info.get('title') or 'this playlist'} since the last sync.")
+            self.download_btn.setEnabled(True)
+            self.status_label.setText('Nothing new to download')
+            return
+
         if is_playlist:
             title = info.get('title', 'Playlist')
             msg = QMessageBox(self)
             msg.setWindowTitle('Playlist detected')
-            msg.setText(f"Detected playlist: {title}\nDo you want to download the entire playlist?")
+            if 'sync_key' in info:
+                msg.setText(f"{len(info['entries'])} new video(s) in {title} since the last sync.\n"
+                            f"Do you want to download them?")
+            else:
+                msg.setText(f"Detected playlist: {title}\nDo you want to download the entire playlist?")
             msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
             ret = msg.exec()
             if ret != QMessageBox.Yes:
@@ -525,17 +1541,28 @@ class YouTubeDownloader(QMainWindow):
                 self.status_label.setText('Download cancelled')
                 return
 
-            first_entry = entries[0]
+            # The entry resolved for its formats (the first one not downloaded yet)
+            resolved = [e for e in entries if e.get('processed_formats') is not None]
+            if not resolved and all(self.download_archive.index(self.path_input.text().strip()).is_complete_entry(e)
+                                    for e in entries):
+                QMessageBox.information(self, "Already downloaded",
+                                        f"All {len(entries)} videos of this playlist are already downloaded.")
+                self.download_btn.setEnabled(True)
+                self.status_label.setText('Nothing to download')
+                return
+
+            first_entry = resolved[0] if resolved else entries[0]
             first_entry['title'] = first_entry.get('title', info.get('title', 'Untitled'))
             first_entry['duration'] = first_entry.get('duration', info.get('duration', 0))
             first_entry['uploader'] = first_entry.get('uploader', info.get('uploader', 'Unknown'))
 
-            dialog = FormatSelectionDialog(first_entry, self.current_thumbnail, self)
-            if dialog.exec() == QDialog.Accepted:
+            dialog = self.show_format_dialog(first_entry)
+            if dialog:
                 selection = dialog.get_selection()
                 if selection:
                     format_id, output_format, has_audio = selection
-                    self.start_download(format_id, output_format, has_audio, is_playlist=True)
+                    self.start_download(format_id, output_format, has_audio, is_playlist=True,
+                                        merge_plan=dialog.merge_plan)
                     return
                 else:
                     self.download_btn.setEnabled(True)
@@ -547,12 +1574,13 @@ class YouTubeDownloader(QMainWindow):
                 return
 
         # Single video case
-        dialog = FormatSelectionDialog(info, self.current_thumbnail, self)
-        if dialog.exec() == QDialog.Accepted:
+        dialog = self.show_format_dialog(info)
+        if dialog:
             selection = dialog.get_selection()
             if selection:
                 format_id, output_format, has_audio = selection
-                self.start_download(format_id, output_format, has_audio, is_playlist=False)
+                self.start_download(format_id, output_format, has_audio, is_playlist=False,
+                                    merge_plan=dialog.merge_plan)
         else:
             self.download_btn.setEnabled(True)
             self.status_label.setText('Download cancelled')
@@ -566,39 +1594,92 @@ class YouTubeDownloader(QMainWindow):
     # -------------------------
     # Download methods
     # -------------------------
-    def start_download(self, format_id, output_format, has_audio, is_playlist=False):
-        url = self.url_input.text().strip()
+    def start_download(self, format_id, output_format, has_audio, is_playlist=False, merge_plan=None):
+        url = self.info_thread.url
         output_path = self.path_input.text().strip()
+        info = self.current_video_info
+        title = info.get('title') or url
+
+        if merge_plan is not None:
+            needed = required_space(merge_plan, info, self.download_archive.index(output_path))
+            available = free_bytes(output_path) - RESERVE_BYTES
+            if needed > available:
+                ret = QMessageBox.question(self, "Not enough disk space",
+                                           f"This download needs about {format_bytes(needed)}, but only "
+                                           f"{format_bytes(max(available, 0))} is free in {output_path}.\n\n"
+                                           "Queue it anyway?")
+                if ret != QMessageBox.Yes:
+                    self.download_btn.setEnabled(True)
+                    self.status_label.setText('Download cancelled')
+                    return
 
-        self.status_label.setText("Starting download...")
-        self.progress_bar.setValue(0)
-
-        self.download_thread = DownloadThread(url, format_id, output_path, output_format, has_audio, is_playlist=is_playlist)
-        self.download_thread.progress.connect(self.on_progress)
-        self.download_thread.finished.connect(self.on_finished)
-        self.download_thread.start()
-
-    def on_progress(self, percent, message):
-        self.progress_bar.setValue(percent)
-        self.status_label.setText(message)
-
-    def on_finished(self, success, message):
-        if success:
-            self.progress_bar.setValue(100)
-            self.status_label.setText("✓ " + message)
-            QMessageBox.information(self, "Success", message)
+        job = DownloadJob(url, title, format_id, output_path, output_format, has_audio,
+                          is_playlist=is_playlist, info=info,
+                          extractor_calls=self.info_thread.extractor_calls,
+                          performance=load_performance_settings(),
+                          video_id=None if is_playlist else info.get('id'), merge_plan=merge_plan)
+        if 'sync_key' in info:
+            # Queued (and journaled): the next sync starts after these
+            self.sync_state.mark_seen(info)
+        if is_playlist:
+            queued = self.download_queue.add_playlist(job)
         else:
-            self.progress_bar.setValue(0)
-            self.status_label.setText("✗ Download failed")
-            QMessageBox.critical(self, "Error", message)
+            queued = self.download_queue.add_job(job)
+        self.current_video_info = None
+        self.url_input.clear()
+        self.remove_pending(url)
+        self.prefetch_paths.pop(self.prefetcher.key(url), None)
         self.download_btn.setEnabled(True)
+        if queued is job:
+            self.status_label.setText(f"Added to queue: {title}")
+        else:
+            self.status_label.setText(f"Already in the queue: {queued.title}")
+
+    def on_queue_refreshed(self):
+        percent = self.download_queue.overall_percent()
+        if percent != self.progress_bar.value():
+            self.progress_bar.setValue(percent)
+        for job, success, message in self.download_queue.take_finished():
+            self.on_finished(job, success, message)
+
+    def resume_jobs(self):
+        """
+        Re-queue the downloads journaled by a previous run, and clear the
+        staging folders of stale leftovers from runs that are not resumed
+        """
+        records = self.job_journal.pending()
+        folders = {(self.path_input.text().strip(), load_performance_settings()['staging_dir'])}
+        folders.update((r['output_path'], (r.get('performance') or {}).get('staging_dir', '')) for r in records)
+        for output_path, configured in folders:
+            if output_path:
+                clean_staging(staging_dir(output_path, configured))
+        resumed = self.download_queue.restore(records)
+        if resumed:
+            self.status_label.setText(f"Resumed {resumed} unfinished download(s)")
+
+    def on_finished(self, job, success, message):
+        if success:
+            self.status_label.setText(f"✓ {job.title}: {message}")
+        else:
+            self.status_label.setText(f"✗ Download failed: {job.title}")
+            QMessageBox.critical(self, "Error", f"{job.title}\n\n{message}")
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if PySide6.__version__ in BROKEN_PYSIDE_VERSIONS:
+        logging.warning("PySide6 %s loses references to True/None on Python-side signal emits "
+                        "and can abort within minutes of downloading; install another version",
+                        PySide6.__version__)
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     window = YouTubeDownloader()
     window.show()
+    # Let the window paint first, then import yt_dlp and probe ffmpeg
+    # in the background while the user pastes a URL
+    QTimer.singleShot(0, warm_up)
+    QTimer.singleShot(0, ffmpeg_probe.probe_in_background)
+    QTimer.singleShot(0, window.resume_jobs)
     sys.exit(app.exec())
 
 
@@ -0,0 +1,222 @@
+"""
+Per-job performance metrics: extraction latency, time to first byte,
+throughput over time, retries, post-processing time and bytes written.
+Written as JSON lines and as a Prometheus text file with histograms
+(e.g. for node_exporter's textfile collector).
+"""
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+from cache import app_data_dir
+
+# Upper bounds of the histogram buckets, per metric
+HISTOGRAMS = {
+    'extraction_seconds': (0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+    'first_byte_seconds': (0.25, 0.5, 1, 2, 5, 10, 30, 60),
+    'download_seconds': (1, 5, 15, 30, 60, 120, 300, 900, 1800),
+    'postprocess_seconds': (0.1, 0.5, 1, 2, 5, 10, 30, 120),
+    'throughput_bytes_per_second': (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2,
+                                    16 * 1024 ** 2, 64 * 1024 ** 2),
+    'bytes_written': (1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2, 1024 ** 3, 4 * 1024 ** 3),
+}
+HISTOGRAM_HELP = {
+    'extraction_seconds': "Time to fetch video/playlist info",
+    'first_byte_seconds': "Time from job start to the first downloaded byte",
+    'download_seconds': "Wall time of a download job",
+    'postprocess_seconds': "Time spent in ffmpeg post-processing (merge, extract, convert)",
+    'throughput_bytes_per_second': "Average throughput of a download job",
+    'bytes_written': "Bytes of the finished files of a download job",
+}
+COUNTER_HELP = {
+    'jobs_total': "Download jobs finished, by result",
+    'fragment_retries_total': "Fragment download retries",
+    'http_retries_total': "HTTP download retries",
+    'bytes_downloaded_total': "Bytes received from the network",
+    'bytes_written_total': "Bytes of finished files",
+}
+
+
+class JobMetrics:
+    """
+    Measurements of one download job, filled in by core.Downloader:
+    progress() is the yt-dlp progress hook, message() sees yt-dlp's log
+    lines (for retries, and to tell fragment downloads from plain HTTP
+    ones before the first progress report). Throughput is sampled once per sample_interval
+    seconds, halving the resolution whenever max_samples is reached.
+    """
+    def __init__(self, url, sample_interval=1.0, max_samples=600, clock=time.monotonic):
+        self.url = url
+        self.clock = clock
+        self.started = clock()
+        self.wall_started = time.time()
+        self.sample_interval = sample_interval
+        self.max_samples = max_samples
+        self.first_byte_seconds = None
+        self.throughput = []  # [seconds since start, bytes/s]
+        self.last_sample = None
+        self.fragment_retries = 0
+        self.http_retries = 0
+        self.fragmented = False  # current download is DASH/HLS fragments
+        self.fragments_announced = False  # "Total fragments" logged, destination not yet
+        self.bytes_downloaded = 0
+        self.bytes_written = 0
+        self.postprocess_seconds = 0.0
+        self.download_seconds = None
+        self.success = None
+        self.files = {}  # filename -> bytes downloaded
+
+    def progress(self, d):
+        if d.get('status') not in ('downloading', 'finished'):
+            return
+        now = self.clock()
+        downloaded = d.get('downloaded_bytes') or 0
+        self.files[d.get('filename') or d.get('tmpfilename')] = downloaded
+        if self.first_byte_seconds is None and downloaded:
+            self.first_byte_seconds = now - self.started
+        if d.get('speed') is not None and (self.last_sample is None
+                                           or now - self.last_sample >= self.sample_interval):
+            self.last_sample = now
+            self.throughput.append([round(now - self.started, 2), round(d['speed'])])
+            if len(self.throughput) >= self.max_samples:
+                self.throughput = self.throughput[::2]
+                self.sample_interval *= 2
+
+    def message(self, msg):
+        # Each download logs its destination before fetching anything; the
+        # fragment downloaders ([hlsnative], [dashsegments], ...) log their
+        # fragment count right before it
+        if '] Total fragments: ' in msg:
+            self.fragments_announced = True
+        elif msg.startswith('[download] Destination: '):
+            self.fragmented = self.fragments_announced
+            self.fragments_announced = False
+        elif 'Retrying' in msg:
+            # Fragments are fetched by the plain HTTP downloader, whose
+            # retry messages do not mention the fragment
+            if 'fragment' in msg or self.fragmented:
+                self.fragment_retries += 1
+            else:
+                self.http_retries += 1
+
+    def file_written(self, path):
+        try:
+            self.bytes_written += os.path.getsize(path)
+        except (OSError, TypeError):
+            pass
+
+    def finish(self, success, postprocess_seconds=0.0):
+        self.success = success
+        self.download_seconds = self.clock() - self.started
+        self.postprocess_seconds = postprocess_seconds
+        self.bytes_downloaded = sum(self.files.values())
+
+    def record(self):
+        throughput = None
+        transfer = (self.download_seconds or 0) - (self.first_byte_seconds or 0) - self.postprocess_seconds
+        if self.bytes_downloaded and transfer > 0:
+            throughput = self.bytes_downloaded / transfer
+        return {
+            'event': 'job',
+            'time': round(self.wall_started, 3),
+            'url': self.url,
+            'success': self.success,
+            'first_byte_seconds': self.first_byte_seconds,
+            'download_seconds': self.download_seconds,
+            'postprocess_seconds': self.postprocess_seconds,
+            'throughput_bytes_per_second': throughput,
+            'throughput': self.throughput,
+            'fragment_retries': self.fragment_retries,
+            'http_retries': self.http_retries,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_written': self.bytes_written,
+        }
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsSink:
+    """
+    Appends job and extraction records to <dir>/metrics.jsonl (rotated at
+    max_bytes) and rewrites <dir>/metrics.prom after every record.
+    Thread-safe; counters and histograms cover the current process.
+    """
+    def __init__(self, path=None, max_bytes=16 * 1024 ** 2, prefix='youtube_downloader'):
+        self.path = Path(path or app_data_dir() / 'metrics')
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {name: Histogram(buckets) for name, buckets in HISTOGRAMS.items()}
+        self.counters = {}  # (name, labels) -> value
+
+    def record_extraction(self, url, seconds, extractor_calls, cached):
+        with self.lock:
+            self.histograms['extraction_seconds'].observe(seconds)
+            self._write({'event': 'extraction', 'time': round(time.time(), 3), 'url': url,
+                         'seconds': seconds, 'extractor_calls': extractor_calls, 'cached': cached})
+
+    def record_job(self, metrics):
+        record = metrics.record()
+        with self.lock:
+            for name in HISTOGRAMS:
+                if record.get(name) is not None and name != 'extraction_seconds':
+                    self.histograms[name].observe(record[name])
+            self._count('jobs_total', 1, f'result="{"success" if record["success"] else "failure"}"')
+            self._count('fragment_retries_total', record['fragment_retries'])
+            self._count('http_retries_total', record['http_retries'])
+            self._count('bytes_downloaded_total', record['bytes_downloaded'])
+            self._count('bytes_written_total', record['bytes_written'])
+            self._write(record)
+
+    def _count(self, name, value, labels=''):
+        self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def _write(self, record):
+        log = self.path / 'metrics.jsonl'
+        try:
+            if log.exists() and log.stat().st_size > self.max_bytes:
+                os.replace(log, self.path / 'metrics.jsonl.1')
+            with open(log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            prom = self.path / 'metrics.prom'
+            tmp = prom.with_name('metrics.prom.tmp')
+            tmp.write_text(self.prometheus_text(), encoding='utf-8')
+            os.replace(tmp, prom)
+        except OSError:
+            pass
+
+    def prometheus_text(self):
+        lines = []
+        for name, histogram in self.histograms.items():
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {HISTOGRAM_HELP[name]}")
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.sum}")
+            lines.append(f"{metric}_count {histogram.count}")
+        for name, help_text in COUNTER_HELP.items():
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, labels), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f"{metric}{{{labels}}} {value}" if labels else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
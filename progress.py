@@ -0,0 +1,134 @@
+import time
+
+
+def format_bytes(count):
+    if count is None:
+        return "N/A"
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(count) < 1024 or unit == 'GiB':
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "N/A"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def describe_progress(snapshot):
+    """
+    Human readable status line for a ProgressAggregator snapshot
+    """
+    if snapshot['status'] == 'finished':
+        text = "Processing and merging..."
+    else:
+        text = f"Downloading: {format_bytes(snapshot['speed'])}/s, ETA {format_eta(snapshot['eta'])}"
+        if snapshot['total_bytes']:
+            text += f" ({format_bytes(snapshot['entry_bytes'])} of {format_bytes(snapshot['total_bytes'])})"
+    if snapshot['n_entries'] and snapshot['n_entries'] > 1:
+        text = f"Entry {snapshot['entry']}/{snapshot['n_entries']} - {text}"
+    return text
+
+
+class ProgressAggregator:
+    """
+    Coalesces yt-dlp progress hook calls into at most one snapshot per
+    interval (seconds), with smoothed speed and ETA and progress across
+    all files of a video (video + audio) and, for whole-playlist downloads
+    (playlist=True), all entries of the playlist.
+
+    Snapshots are dicts passed to emit():
+        status          'downloading' or 'finished' (a file finished)
+        percent         overall progress of the job, 0-100
+        entry           1-based entry number within the playlist (or 1)
+        n_entries       number of playlist entries (or None)
+        entry_bytes     bytes downloaded for the current entry
+        total_bytes     expected bytes of the current entry (or None)
+        downloaded_bytes bytes downloaded by the whole job
+        speed           smoothed speed in bytes/s (or None)
+        eta             seconds left for the current entry (or None)
+    """
+    def __init__(self, emit, interval=0.25, smoothing=0.3, playlist=False, clock=time.monotonic):
+        self.emit = emit
+        self.playlist = playlist
+        self.interval = interval
+        self.smoothing = smoothing
+        self.clock = clock
+        self.last_emit = None
+        self.speed = None
+        self.files = {}          # filename -> [entry key, downloaded, total]
+        self.entry_key = None
+        self.entry_total = None
+        self.entry = 1
+        self.n_entries = None
+
+    def hook(self, d):
+        """
+        yt-dlp progress hook
+        """
+        status = d.get('status')
+        if status not in ('downloading', 'finished'):
+            return
+        info = d.get('info_dict') or {}
+        self.track_entry(info)
+
+        filename = d.get('filename') or d.get('tmpfilename')
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if status == 'finished':
+            total = total or downloaded
+        self.files[filename] = [self.entry_key, downloaded, total]
+
+        speed = d.get('speed')
+        if speed is not None:
+            self.speed = speed if self.speed is None else (
+                self.smoothing * speed + (1 - self.smoothing) * self.speed)
+
+        now = self.clock()
+        if status == 'downloading' and self.last_emit is not None and now - self.last_emit < self.interval:
+            return
+        self.last_emit = now
+        self.emit(self.snapshot(status))
+
+    def track_entry(self, info):
+        key = (info.get('playlist_index'), info.get('id'))
+        if key == self.entry_key:
+            return
+        self.entry_key = key
+        if self.playlist:
+            self.entry = info.get('playlist_autonumber') or 1
+            self.n_entries = info.get('n_entries')
+        # Expected bytes of all streams of the entry, if yt-dlp knows them
+        formats = info.get('requested_formats') or [info]
+        sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+        self.entry_total = sum(sizes) if all(sizes) else None
+
+    def snapshot(self, status):
+        entry_files = [f for f in self.files.values() if f[0] == self.entry_key]
+        entry_bytes = sum(f[1] for f in entry_files)
+        total = self.entry_total
+        if total is None and all(f[2] for f in entry_files):
+            total = sum(f[2] for f in entry_files)
+        fraction = min(entry_bytes / total, 1.0) if total else 0.0
+        if self.n_entries and self.n_entries > 1:
+            percent = (self.entry - 1 + fraction) * 100 / self.n_entries
+        else:
+            percent = fraction * 100
+        eta = None
+        if total and self.speed:
+            eta = max(total - entry_bytes, 0) / self.speed
+        return {
+            'status': status,
+            'percent': percent,
+            'entry': self.entry,
+            'n_entries': self.n_entries,
+            'entry_bytes': entry_bytes,
+            'total_bytes': total,
+            'downloaded_bytes': sum(f[1] for f in self.files.values()),
+            'speed': self.speed,
+            'eta': eta,
+        }
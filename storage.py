@@ -0,0 +1,221 @@
+"""
+Storage side of a download: free space checks against the estimated size
+of a job, and a staging folder on the destination filesystem for the
+.part/fragment files and unmerged streams, so that finishing a download
+is a rename instead of a copy.
+"""
+import os
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+
+from progress import format_bytes
+
+logger = logging.getLogger('youtube_downloader')
+
+# Default staging folder, inside the save folder
+STAGING_DIRNAME = '.staging'
+# Always left free on the destination filesystem
+RESERVE_BYTES = 256 * 1024 ** 2
+# Staging files untouched for this long belong to runs that will not be resumed
+STALE_STAGING_SECONDS = 7 * 24 * 3600
+
+
+class NotEnoughSpace(Exception):
+    pass
+
+
+def existing_dir(path):
+    """
+    path, or its nearest existing parent (the save folder may not exist yet)
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def free_bytes(path):
+    return shutil.disk_usage(existing_dir(path)).free
+
+
+def same_filesystem(a, b):
+    return os.stat(existing_dir(a)).st_dev == os.stat(existing_dir(b)).st_dev
+
+
+def staging_dir(output_path, configured=''):
+    """
+    Folder for the temporary files of downloads into output_path: the
+    configured one if it is on the same filesystem, else .staging inside
+    output_path
+    """
+    if configured:
+        try:
+            if same_filesystem(configured, output_path):
+                return os.path.abspath(os.path.expanduser(configured))
+            logger.warning("Staging folder %s is not on the filesystem of %s, using %s instead",
+                           configured, output_path, STAGING_DIRNAME)
+        except OSError as e:
+            logger.warning("Staging folder %s not usable: %s", configured, e)
+    return os.path.join(os.path.abspath(os.path.expanduser(output_path)), STAGING_DIRNAME)
+
+
+def estimate_bytes(plan, entries=None, preview=None):
+    """
+    Estimated bytes of the files a job with this plan (core.plan_merge /
+    plan_audio) leaves behind; for a playlist, of the given entries, scaled
+    by their duration relative to the preview entry the plan was made for
+    when both are known. 0 if the plan has no size estimate.
+    """
+    size = plan.get('size') or 0
+    if entries is None:
+        return size
+    base = (preview or {}).get('duration')
+    total = 0
+    for entry in entries:
+        duration = entry.get('duration')
+        total += size * duration / base if base and duration else size
+    return int(total)
+
+
+def required_bytes(plan, estimated):
+    """
+    Free space a job needs: its files, plus what exists next to the last
+    one while it is finished (the separate streams until they are merged,
+    the intermediate MKV until it is converted)
+    """
+    size = plan.get('size') or 0
+    extra = 0
+    if plan.get('video') and plan.get('audio'):
+        extra += size
+    if plan.get('transcode') and not plan.get('audio_only'):
+        extra += size
+    return estimated + extra if estimated else 0
+
+
+class Claim:
+    """
+    Bytes one running download counts on. What it has written so far is
+    already gone from the free space, so only the rest is still claimed.
+    """
+    def __init__(self, needed):
+        self.needed = needed
+        self.written = 0
+        self.files = {}  # file -> bytes written
+
+    def progress(self, d):
+        """
+        yt-dlp progress hook
+        """
+        name = d.get('filename') or d.get('tmpfilename')
+        written = d.get('downloaded_bytes') or 0
+        self.written += written - self.files.get(name, 0)
+        self.files[name] = written
+
+    @property
+    def remaining(self):
+        return max(self.needed - self.written, 0)
+
+
+class DiskSpace:
+    """
+    Free space claims of the running downloads, per filesystem, so that
+    parallel jobs do not each count on the same free bytes
+    """
+    def __init__(self, reserve=RESERVE_BYTES):
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        self.claims = {}  # st_dev -> Claims of the running jobs
+
+    def check(self, path, needed):
+        """
+        Raise NotEnoughSpace unless needed bytes fit on the filesystem of path
+        """
+        directory = existing_dir(path)
+        device = os.stat(directory).st_dev
+        free = shutil.disk_usage(directory).free
+        claimed = sum(claim.remaining for claim in self.claims.get(device, ()))
+        if needed and free - claimed - needed < self.reserve:
+            message = (f"Not enough disk space in {path}: the download needs about "
+                       f"{format_bytes(needed)}, {format_bytes(max(free - self.reserve, 0))} is available")
+            if claimed:
+                message += f" ({format_bytes(claimed)} of it claimed by running downloads)"
+            raise NotEnoughSpace(message)
+        return device
+
+    @contextmanager
+    def claim(self, path, needed):
+        """
+        Check and hold needed bytes on the filesystem of path while the
+        block runs; yields the Claim, to be fed the download's progress
+        """
+        claim = Claim(needed)
+        with self.lock:
+            device = self.check(path, needed)
+            self.claims.setdefault(device, []).append(claim)
+        try:
+            yield claim
+        finally:
+            with self.lock:
+                self.claims[device].remove(claim)
+
+
+disk_space = DiskSpace()
+
+
+class StagingFolders:
+    """
+    Downloads using each staging folder; the last one to finish cleans it
+    up, so it is never removed while another download writes into it
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = {}  # staging folder -> running downloads
+
+    @contextmanager
+    def use(self, path):
+        with self.lock:
+            self.users[path] = self.users.get(path, 0) + 1
+        try:
+            yield path
+        finally:
+            with self.lock:
+                self.users[path] -= 1
+                if not self.users[path]:
+                    del self.users[path]
+                    clean_staging(path)
+
+
+staging_folders = StagingFolders()
+
+
+def clean_staging(path, max_age=STALE_STAGING_SECONDS):
+    """
+    Delete the files in staging folder path left by failed runs (untouched
+    for max_age seconds; newer ones may still be resumed) and the folder
+    itself once empty. Returns the bytes freed.
+    """
+    freed = 0
+    cutoff = time.time() - max_age
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        size = entry.stat().st_size
+                        os.remove(entry.path)
+                        freed += size
+                except OSError:
+                    pass
+        if not os.listdir(path):
+            os.rmdir(path)
+    except OSError:
+        return freed
+    if freed:
+        logger.info("Removed %s of leftovers from %s", format_bytes(freed), path)
+    return freed
@@ -0,0 +1,51 @@
+"""
+Playlist/channel sync state: the entry IDs already seen per playlist, so a
+sync only pages through the entries added since the last run (see
+core.fetch_new_entries).
+"""
+import time
+
+from cache import SQLiteStore, app_data_dir
+
+
+class SyncState(SQLiteStore):
+    """
+    Persistent (SQLite) record of the entries seen per playlist key
+    (core.sync_key) and of when each playlist was last synced
+    """
+    def __init__(self, path=None):
+        super().__init__(path or app_data_dir() / 'sync.sqlite3')
+        with self.connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS seen ("
+                       "playlist TEXT NOT NULL, video_id TEXT NOT NULL, first_seen REAL NOT NULL, "
+                       "PRIMARY KEY (playlist, video_id))")
+            db.execute("CREATE TABLE IF NOT EXISTS playlists ("
+                       "playlist TEXT PRIMARY KEY, url TEXT, title TEXT, synced REAL NOT NULL)")
+
+    def known(self, key):
+        """
+        IDs of the entries of playlist key seen by earlier syncs
+        """
+        with self.locked() as db:
+            return {row[0] for row in db.execute("SELECT video_id FROM seen WHERE playlist = ?", (key,))}
+
+    def mark_seen(self, info):
+        """
+        Record the entries of a fetch_new_entries() result as seen
+        """
+        key = info['sync_key']
+        now = time.time()
+        rows = [(key, entry['id'], now) for entry in info.get('entries') or []
+                if isinstance(entry, dict) and entry.get('id')]
+        with self.locked() as db:
+            db.executemany("INSERT OR IGNORE INTO seen (playlist, video_id, first_seen) VALUES (?, ?, ?)", rows)
+            db.execute("INSERT OR REPLACE INTO playlists (playlist, url, title, synced) VALUES (?, ?, ?, ?)",
+                       (key, info.get('webpage_url'), info.get('title'), now))
+
+    def forget(self, key):
+        """
+        Drop what was seen of playlist key, so its next sync walks all entries
+        """
+        with self.locked() as db:
+            db.execute("DELETE FROM seen WHERE playlist = ?", (key,))
+            db.execute("DELETE FROM playlists WHERE playlist = ?", (key,))
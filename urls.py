@@ -0,0 +1,71 @@
+"""
+Canonical (kind, id) keys for YouTube URLs, so a video or playlist is
+recognised whatever URL shape it was pasted in: watch, shorts, embed,
+live and youtu.be links, on www., m., music. and nocookie hosts.
+"""
+import re
+from urllib.parse import urlparse, parse_qs
+
+YOUTUBE_DOMAINS = ('youtube.com', 'youtube-nocookie.com')
+SHORT_DOMAINS = ('youtu.be',)
+# First path segment of URLs with the video ID as second segment
+VIDEO_PATHS = ('shorts', 'embed', 'v', 'e', 'live')
+
+VIDEO_ID_RE = re.compile(r'[\w-]{11}')
+PLAYLIST_ID_RE = re.compile(r'[\w-]{2,}')
+
+
+def _parse(url):
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if any(host == d or host.endswith('.' + d) for d in YOUTUBE_DOMAINS):
+        site = 'youtube'
+    elif host in SHORT_DOMAINS:
+        site = 'short'
+    else:
+        site = None
+    return site, [p for p in parsed.path.split('/') if p], parse_qs(parsed.query)
+
+
+def video_id(url):
+    """
+    ID of the video a YouTube URL shows (also for a watch URL inside a
+    playlist), or None
+    """
+    site, path, query = _parse(url)
+    candidate = None
+    if site == 'youtube':
+        if path[:1] == ['watch'] or not path:
+            candidate = query.get('v', [None])[0]
+        elif len(path) >= 2 and path[0] in VIDEO_PATHS:
+            candidate = path[1]
+    elif site == 'short' and path:
+        candidate = path[0]
+    return candidate if candidate and VIDEO_ID_RE.fullmatch(candidate) else None
+
+
+def playlist_id(url):
+    site, path, query = _parse(url)
+    if site is None:
+        return None
+    candidate = query.get('list', [None])[0]
+    return candidate if candidate and PLAYLIST_ID_RE.fullmatch(candidate) else None
+
+
+def canonicalize(url):
+    """
+    ('playlist', id) or ('video', id) for a YouTube URL, None if the URL
+    is not recognised. Like yt-dlp, a URL carrying a list= parameter
+    stands for the playlist.
+    """
+    playlist = playlist_id(url)
+    if playlist:
+        return 'playlist', playlist
+    video = video_id(url)
+    if video:
+        return 'video', video
+    return None
+